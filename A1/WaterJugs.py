@@ -9,6 +9,8 @@ To use the search routines we subclass the "StateSpace" class and implement spec
  successors
  hashable_state
  print_state
+and, optionally (to allow bidirectional search),
+ predecessors
 
 Then we also implement some utility functions to ease the use of SearchEngine.search
 In particular, we implement a way of specifying goal functions and a couple of heurstics.
@@ -36,22 +38,24 @@ class WaterJugs(StateSpace):
         transtion."""
 
         States = list()
-        if self.gal3 > 0 :
-            States.append( WaterJugs('Empty 3 Gallon', self.gval+1, 0, self.gal4, self) )
-        if self.gal3 < 3 :
-            States.append( WaterJugs('Fill 3 Gallon', self.gval+1, 3, self.gal4, self) )
-        if self.gal4 > 0 :
-            States.append( WaterJugs('Empty 4 Gallon', self.gval+1, self.gal3, 0, self) )
-        if self.gal4 < 4 :
-            States.append( WaterJugs('Fill 4 Gallon', self.gval+1, self.gal3, 4, self) )
-        if self.gal4 < 4 and self.gal3 > 0:
-            maxpour = min( 4 - self.gal4, self.gal3 ) #at most can only fill up 4 gallon
-            States.append( WaterJugs('Pour 3 into 4', self.gval+1, self.gal3-maxpour, self.gal4+maxpour, self) )
-        if self.gal3 < 3 and self.gal4 > 0:
-            maxpour = min( 3 - self.gal3, self.gal4 ) #at most can only fill up 3 gallon
-            States.append( WaterJugs('Pour 4 into 3', self.gval+1, self.gal3+maxpour, self.gal4-maxpour, self) )
+        for action, gal3, gal4 in _jug_actions(self.gal3, self.gal4):
+            States.append( WaterJugs(action, self.gval+1, gal3, gal4, self) )
         return States
     
+    def predecessors(self):
+        """The states from which one of the six actions leads to self.
+        Emptying and filling cannot be undone by a single action, so
+        rather than inverting each action we check every (gal3, gal4)
+        pair, of which there are only 20."""
+
+        States = list()
+        for gal3 in range(0, 4):
+            for gal4 in range(0, 5):
+                for action, new3, new4 in _jug_actions(gal3, gal4):
+                    if new3 == self.gal3 and new4 == self.gal4:
+                        States.append( WaterJugs(action, self.gval+1, gal3, gal4, self) )
+        return States
+
     def hashable_state(self) :
         return (self.gal3, self.gal4)
 
@@ -61,6 +65,26 @@ class WaterJugs(StateSpace):
         else:
             print("Action=\"{}\", S{}, g-value = {}, (3gal, 4gal) = ({},{}), (Initial state)".format(self.action, self.index, self.gval, self.gal3, self.gal4))
 
+def _jug_actions(gal3, gal4):
+    '''Returns a list of (action, gal3, gal4) triples, one for each action
+    that changes the state (gal3, gal4), in the order used by successors'''
+    actions = list()
+    if gal3 > 0 :
+        actions.append( ('Empty 3 Gallon', 0, gal4) )
+    if gal3 < 3 :
+        actions.append( ('Fill 3 Gallon', 3, gal4) )
+    if gal4 > 0 :
+        actions.append( ('Empty 4 Gallon', gal3, 0) )
+    if gal4 < 4 :
+        actions.append( ('Fill 4 Gallon', gal3, 4) )
+    if gal4 < 4 and gal3 > 0:
+        maxpour = min( 4 - gal4, gal3 ) #at most can only fill up 4 gallon
+        actions.append( ('Pour 3 into 4', gal3-maxpour, gal4+maxpour) )
+    if gal3 < 3 and gal4 > 0:
+        maxpour = min( 3 - gal3, gal4 ) #at most can only fill up 3 gallon
+        actions.append( ('Pour 4 into 3', gal3+maxpour, gal4-maxpour) )
+    return actions
+
 #Some auxillary heuristic functions and goal test functions.
 
 #We use this to store the current goal
@@ -103,6 +127,233 @@ def waterjugs_h_total_diff_function(state):
         wsum = wsum + WaterJugs.goal_state[1]
     return abs(state.gal3+state.gal4 - wsum)
 
+class JugSystem:
+    '''N jugs with the given capacities (in gallons). The amounts of water
+    in the jugs are packed into a single integer, a mixed radix number
+    whose i-th digit (of base capacities[i]+1) is the amount in jug i.
+    Actions are numbered; action_names gives their names.'''
+
+    def __init__(self, capacities):
+        self.capacities = tuple(capacities)
+        self.places = []
+        place = 1
+        for capacity in self.capacities:
+            self.places.append(place)
+            place = place * (capacity + 1)
+        self.num_codes = place
+        #for each action (kind, i, j): 'empty' or 'fill' jug i, or 'pour' jug i into jug j
+        self.actions = list()
+        for i in range(len(self.capacities)):
+            self.actions.append(('empty', i, None))
+            self.actions.append(('fill', i, None))
+        for i in range(len(self.capacities)):
+            for j in range(len(self.capacities)):
+                if i != j:
+                    self.actions.append(('pour', i, j))
+        self.action_names = list()
+        for kind, i, j in self.actions:
+            if kind == 'pour':
+                self.action_names.append('Pour jug {} into jug {}'.format(i, j))
+            else:
+                self.action_names.append('{} jug {} ({} Gallon)'.format(kind.capitalize(), i, self.capacities[i]))
+        #(action number, i, j, place of i, place of j, capacity of j) of each pour
+        self.pours = [(a, i, j, self.places[i], self.places[j], self.capacities[j])
+                      for a, (kind, i, j) in enumerate(self.actions) if kind == 'pour']
+
+    def pack(self, amounts):
+        code = 0
+        for amount, place in zip(amounts, self.places):
+            code = code + amount * place
+        return code
+
+    def unpack(self, code):
+        return tuple((code // place) % (capacity + 1) for place, capacity in zip(self.places, self.capacities))
+
+    def transitions(self, code):
+        '''Returns a list of (action number, code) pairs, one for each
+        action that changes the state code'''
+        capacities = self.capacities
+        places = self.places
+        amounts = [(code // place) % (capacity + 1) for place, capacity in zip(places, capacities)]
+        result = list()
+        for i, amount in enumerate(amounts):
+            if amount > 0:
+                result.append( (2*i, code - amount * places[i]) )
+            if amount < capacities[i]:
+                result.append( (2*i + 1, code + (capacities[i] - amount) * places[i]) )
+        for a, i, j, place_i, place_j, capacity_j in self.pours:
+            if amounts[i] > 0 and amounts[j] < capacity_j:
+                maxpour = min( capacity_j - amounts[j], amounts[i] )
+                result.append( (a, code + maxpour * (place_j - place_i)) )
+        return result
+
+    def matcher(self, targets):
+        '''Returns a function testing if a code matches any of the targets.
+        A target gives an amount, or the wild card '*', for each jug; a
+        single target may be given rather than a list of them.'''
+        if targets and not isinstance(targets[0], (tuple, list)):
+            targets = [targets]
+        #each target as a list of (place, base, amount) for the jugs it fixes
+        tests = [[(place, capacity + 1, amount)
+                  for place, capacity, amount in zip(self.places, self.capacities, target) if amount != '*']
+                 for target in targets]
+        def matches(code):
+            for test in tests:
+                for place, base, amount in test:
+                    if (code // place) % base != amount:
+                        break
+                else:
+                    return True
+            return False
+        return matches
+
+    def explore(self, start):
+        '''Breadth first search of all the states reachable from the
+        amounts start, returning a JugGraph. Unlike SearchEngine this works
+        on the packed codes directly, with the states reached kept in
+        dictionaries keyed by code (so memory grows with the states reached
+        rather than with all the possible codes), and generates the same
+        transitions as transitions() inline.'''
+        start = self.pack(start)
+        digits = [(place, capacity + 1) for place, capacity in zip(self.places, self.capacities)]
+        fills = [(2*i, 2*i + 1, place, capacity) for i, (place, capacity) in enumerate(zip(self.places, self.capacities))]
+        pours = self.pours
+        parent_codes = {start: None}
+        parent_actions = dict()
+        order = [start]
+        layers = [0, 1]
+        frontier = [start]
+        while frontier:
+            next_frontier = list()
+            for code in frontier:
+                amounts = [(code // place) % base for place, base in digits]
+                for empty, fill, place, capacity in fills:
+                    amount = amounts[empty >> 1]
+                    if amount > 0:
+                        new_code = code - amount * place
+                        if new_code not in parent_codes:
+                            parent_codes[new_code] = code
+                            parent_actions[new_code] = empty
+                            next_frontier.append(new_code)
+                    if amount < capacity:
+                        new_code = code + (capacity - amount) * place
+                        if new_code not in parent_codes:
+                            parent_codes[new_code] = code
+                            parent_actions[new_code] = fill
+                            next_frontier.append(new_code)
+                for a, i, j, place_i, place_j, capacity_j in pours:
+                    amount = amounts[i]
+                    room = capacity_j - amounts[j]
+                    if amount > 0 and room > 0:
+                        new_code = code + (room if room < amount else amount) * (place_j - place_i)
+                        if new_code not in parent_codes:
+                            parent_codes[new_code] = code
+                            parent_actions[new_code] = a
+                            next_frontier.append(new_code)
+            order.extend(next_frontier)
+            if next_frontier:
+                layers.append(len(order))
+            frontier = next_frontier
+        return JugGraph(self, start, order, layers, parent_codes, parent_actions)
+
+class JugGraph:
+    '''The states reachable from a start state of a JugSystem, in breadth
+    first order (the states at distance d are order[layers[d]:layers[d+1]]),
+    each with the state and action it was first reached from. Goal queries
+    are answered from it without searching again.'''
+
+    def __init__(self, system, start, order, layers, parent_codes, parent_actions):
+        self.system = system
+        self.start = start
+        self.order = order
+        self.layers = layers
+        self.parent_codes = parent_codes
+        self.parent_actions = parent_actions
+
+    def __len__(self):
+        return len(self.order)
+
+    def solve(self, targets):
+        '''Returns (cost, list of action names) of a shortest way of reaching
+        any of the targets (see JugSystem.matcher), or None if unreachable.'''
+        matches = self.system.matcher(targets)
+        for distance in range(len(self.layers) - 1):
+            for code in self.order[self.layers[distance]:self.layers[distance+1]]:
+                if matches(code):
+                    return (distance, self.actions(code))
+        return None
+
+    def actions(self, code):
+        '''Returns the names of the actions on the path from the start to code'''
+        actions = list()
+        while code != self.start:
+            actions.append(self.system.action_names[self.parent_actions[code]])
+            code = self.parent_codes[code]
+        actions.reverse()
+        return actions
+
+class MultiJugs(StateSpace):
+    '''A state of a JugSystem (N jugs with arbitrary capacities).'''
+
+    def __init__(self, action, gval, system, code, parent = None):
+        StateSpace.__init__(self, action, gval, parent)
+        self.system = system
+        self.code = code
+
+    @staticmethod
+    def start(system, amounts):
+        '''Returns the initial state with the given amounts in the jugs'''
+        return MultiJugs("START", 0, system, system.pack(amounts))
+
+    def amounts(self):
+        return self.system.unpack(self.code)
+
+    def successors(self):
+        names = self.system.action_names
+        States = list()
+        for action, code in self.system.transitions(self.code):
+            States.append( MultiJugs(names[action], self.gval+1, self.system, code, self) )
+        return States
+
+    def hashable_state(self) :
+        return self.code
+
+    def pack_state(self):
+        return self.code.to_bytes(((self.system.num_codes - 1).bit_length() + 7) // 8, 'big')
+
+    def unpack_state(self, data):
+        return MultiJugs("START", 0, self.system, int.from_bytes(data, 'big'))
+
+    def print_state(self):
+        if self.parent:
+            print("Action= \"{}\", S{}, g-value = {}, amounts = {}, (From S{})".format(self.action, self.index, self.gval, self.amounts(), self.parent.index))
+        else:
+            print("Action=\"{}\", S{}, g-value = {}, amounts = {}, (Initial state)".format(self.action, self.index, self.gval, self.amounts()))
+
+def multijugs_goal_fn(system, targets):
+    '''Returns a goal function for MultiJugs states of system that tests
+    for any of the targets, allowing wild cards '*' (see JugSystem.matcher)'''
+    matches = system.matcher(targets)
+    return lambda state: matches(state.code)
+
+def multijugs_h_count_function(system, targets):
+    '''Returns an admissible heuristic: since an action changes at most two
+    jugs, half the number of jugs that differ from the closest target'''
+    if targets and not isinstance(targets[0], (tuple, list)):
+        targets = [targets]
+    def h_count(state):
+        amounts = system.unpack(state.code)
+        best = None
+        for target in targets:
+            differ = 0
+            for amount, goal in zip(amounts, target):
+                if goal != '*' and amount != goal:
+                    differ = differ + 1
+            if best is None or differ < best:
+                best = differ
+        return (best + 1) // 2
+    return h_count
+
 if __name__ == "__main__":
 
     #sample runs 
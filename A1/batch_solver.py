@@ -0,0 +1,237 @@
+'''Batch solver for LunarLockout problems.
+
+Solves a list of LunarLockout problems (from PROBLEMS in solution.py, or from a file of boards) across a pool of
+processes, with a time budget per problem and a selectable search strategy and heuristic. Writes one JSON object
+per line for each problem, e.g.
+
+  python batch_solver.py --strategy astar --heuristic L --timebound 5 --processes 4 > results.jsonl
+  python batch_solver.py --boards boards.jsonl --strategy anytime_weighted_astar --heuristic alternate
+  python batch_solver.py --heuristic pdb --pdb lockout_5_3.pdb --pdb lockout_7_3.pdb
+
+With --cache, solutions are kept in an SQLite database (see solution_cache.py) shared by the worker processes,
+and boards whose solution (or that of a symmetric board) is already cached are not searched again.
+
+A boards file holds one JSON object per line of the form
+  {"id": "b1", "size": 5, "robots": [[0, 0], [1, 0]], "xanadus": [[0, 1]]}
+where "id" is optional (the line number is used instead). A board that cannot be solved because of an error
+(e.g., a malformed board) gets a line of the form {"id": "b1", "strategy": ..., "heuristic": ..., "error": "..."}.
+'''
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from search import *
+from lunarlockout import LunarLockoutState, lockout_goal_state, lockout_dead_state
+from solution import *
+from pattern_database import PatternDatabase
+from solution_cache import SolutionCache
+from vector_heuristics import heur_manhattan_distance_batch, heur_L_distance_batch
+
+HEURISTICS = {
+  'trivial': heur_trivial,
+  'manhattan': heur_manhattan_distance,
+  'L': heur_L_distance,
+  'alternate': heur_alternate,
+}
+
+#batch versions of the heuristics (see SearchEngine.init_search)
+BATCH_HEURISTICS = {
+  'manhattan': heur_manhattan_distance_batch,
+  'L': heur_L_distance_batch,
+}
+
+#heuristics that never overestimate, so that A* solutions with them are optimal
+ADMISSIBLE_HEURISTICS = ['trivial', 'L', 'pdb']
+
+#strategies of the search engine, and the anytime searches of solution.py
+ENGINE_STRATEGIES = ['depth_first', 'breadth_first', 'ucs', 'best_first', 'astar', 'custom', 'idastar', 'beam', 'bounded_best_first']
+ANYTIME_STRATEGIES = {
+  'anytime_weighted_astar': anytime_weighted_astar,
+  'anytime_repairing_astar': anytime_repairing_astar,
+}
+
+def parse_problem_indices(spec, count):
+  '''Returns the list of indices described by spec, e.g., "0-4,7,9" (None selects all count problems).'''
+  if spec is None:
+    return list(range(count))
+  indices = []
+  for part in spec.split(','):
+    if '-' in part:
+      first, last = part.split('-')
+      indices.extend(range(int(first), int(last) + 1))
+    else:
+      indices.append(int(part))
+  return indices
+
+def board_to_dict(problem_id, state):
+  '''Returns the JSON representation of a LunarLockout board (as used in boards files).'''
+  xanadus = state.xanadus
+  if isinstance(xanadus[0], int):
+    xanadus = (xanadus,)
+  return {'id': problem_id, 'size': state.width, 'robots': [list(r) for r in state.robots], 'xanadus': [list(x) for x in xanadus]}
+
+def board_from_dict(board):
+  '''Returns the initial LunarLockoutState of a board in its JSON representation.'''
+  robots = tuple(tuple(r) for r in board['robots'])
+  xanadus = tuple(tuple(x) for x in board['xanadus'])
+  return LunarLockoutState("START", 0, None, board['size'], robots, xanadus)
+
+def load_boards(path):
+  '''Returns the boards (as dictionaries with an "id") in a boards file.'''
+  boards = []
+  with open(path) as f:
+    for line_number, line in enumerate(f):
+      line = line.strip()
+      if not line:
+        continue
+      board = json.loads(line)
+      board.setdefault('id', line_number)
+      boards.append(board)
+  return boards
+
+def pattern_database_heuristic(paths):
+  '''Returns a heuristic that uses the pattern databases in the given files (one per board size), and the L
+  distance on boards of sizes that have none.'''
+  heuristics = dict()
+  for path in paths:
+    pdb = PatternDatabase.load(path)
+    heuristics[pdb.size] = pdb.heuristic()
+  def heur_pattern_database(state):
+    return heuristics.get(state.width, heur_L_distance)(state)
+  return heur_pattern_database
+
+def solve(task):
+  '''Solves one problem. task is a (board, options) pair, where options is a dictionary of the command line
+  options. Returns a dictionary with the results, or with the board's id and an "error" if solving it failed
+  (so that one bad board does not end a batch). Whatever the search prints (e.g., its TRACE lines) goes to
+  stderr, so that the results written to stdout stay one JSON object per line.'''
+  board, options = task
+  try:
+    with contextlib.redirect_stdout(sys.stderr):
+      return solve_board(board, options)
+  except Exception as e:
+    return {'id': board.get('id') if isinstance(board, dict) else None, 'strategy': options['strategy'],
+            'heuristic': options['heuristic'], 'error': '{}: {}'.format(type(e).__name__, e)}
+
+def solve_board(board, options):
+  '''Solves one board (see solve), raising any error.'''
+  initial_state = board_from_dict(board)
+  if options['heuristic'] == 'pdb':
+    heur_fn = pattern_database_heuristic(options['pdb'])
+  else:
+    heur_fn = HEURISTICS[options['heuristic']]
+  strategy = options['strategy']
+
+  start_wall = time.time()
+  start_cpu = os.times()
+  stats = None
+  cache = SolutionCache(options['cache'], options['cache_size']) if options['cache'] else None
+  cached = cache.lookup_entry(initial_state) if cache is not None else None
+  if cached:
+    sNode.n = 0
+    StateSpace.n = 1
+    final = cached[0]
+  elif strategy in ANYTIME_STRATEGIES:
+    #these build their own search engines, so only the global counters are available
+    sNode.n = 0
+    StateSpace.n = 1
+    final = ANYTIME_STRATEGIES[strategy](initial_state, heur_fn, options['weight'], options['timebound'])
+  else:
+    se = SearchEngine(strategy, options['cc'], options['frontier'])
+    se.set_profiling(options['profile'])
+    se.set_timing(options['clock'])
+    se.set_beam_width(options['width'])
+    if options['external']:
+      se.set_external_memory(True, options['external'])
+    weight = options['weight']
+    heur_fn_batch = BATCH_HEURISTICS.get(options['heuristic']) if options['batch'] else None
+    se.init_search(initial_state, lockout_goal_state, heur_fn, lambda sN: fval_function(sN, weight), heur_fn_batch=heur_fn_batch,
+                   dead_fn=lockout_dead_state if options['dead'] else None)
+    final, stats = se.search(options['timebound'], return_stats=True)
+  end_cpu = os.times()
+  if cache is not None:
+    if final and not cached:
+      optimal = strategy in ['ucs', 'breadth_first'] or (strategy in ['astar', 'idastar'] and options['heuristic'] in ADMISSIBLE_HEURISTICS)
+      cache.store(initial_state, final, optimal)
+    cache.close()
+
+  result = {
+    'id': board['id'],
+    'strategy': strategy,
+    'heuristic': options['heuristic'],
+    'solved': bool(final),
+    'cached': bool(cached),
+    'cost': final.gval if final else None,
+    'nodes_expanded': sNode.n,
+    'states_generated': StateSpace.n,
+    'cycle_check_pruned': stats.cycle_check_pruned if stats else None,
+    'cost_bound_pruned': stats.cost_bound_pruned if stats else None,
+    'dead_state_pruned': stats.dead_state_pruned if stats else None,
+    'wall_time': time.time() - start_wall,
+    'cpu_time': (end_cpu[0] - start_cpu[0]) + (end_cpu[1] - start_cpu[1]),
+  }
+  if options['profile'] and stats:
+    for key in ['heur_calls', 'heur_time', 'successors_calls', 'successors_time', 'frontier_trimmed']:
+      result[key] = getattr(stats, key)
+  if options['paths'] and final:
+    actions = []
+    s = final
+    while s.parent:
+      actions.append(s.action)
+      s = s.parent
+    result['actions'] = actions[::-1]
+  return result
+
+def make_parser():
+  '''Returns the command line parser; its defaults are the options of solve when none are given.'''
+  parser = argparse.ArgumentParser(description='Solve a batch of LunarLockout problems, writing JSON lines.')
+  parser.add_argument('--boards', help='file of boards (one JSON object per line); defaults to PROBLEMS')
+  parser.add_argument('--problems', help='indices of the problems to solve, e.g., "0-4,7" (default all)')
+  parser.add_argument('--strategy', default='astar', choices=ENGINE_STRATEGIES + sorted(ANYTIME_STRATEGIES))
+  parser.add_argument('--heuristic', default='alternate', choices=sorted(HEURISTICS) + ['pdb'])
+  parser.add_argument('--batch', action='store_true', help='evaluate the successors of each expansion in one call (manhattan and L only)')
+  parser.add_argument('--pdb', action='append', default=[], help='pattern database file for the pdb heuristic (one per board size; boards of other sizes use L)')
+  parser.add_argument('--dead', action='store_true', help='prune successors that lockout_dead_state reports as unsolvable')
+  parser.add_argument('--cc', default='default', choices=['default', 'none', 'path', 'full'], help='cycle check level')
+  parser.add_argument('--frontier', default='heap', choices=['heap', 'bucket', 'indexed'])
+  parser.add_argument('--weight', type=float, default=4., help='heuristic weight for custom and anytime strategies')
+  parser.add_argument('--width', type=int, default=1000, help='nodes kept by the beam and bounded_best_first strategies')
+  parser.add_argument('--timebound', type=float, default=2., help='time budget per problem (seconds)')
+  parser.add_argument('--clock', default='cpu', choices=['cpu', 'wall'], help='clock measuring the time budget of engine strategies')
+  parser.add_argument('--external', metavar='DIR', help='run breadth_first as an external memory search, with its layer files in DIR')
+  parser.add_argument('--cache', metavar='FILE', help='SQLite solution cache to look boards up in and store solutions in')
+  parser.add_argument('--cache-size', type=int, default=100000, help='number of solutions kept in the cache')
+  parser.add_argument('--processes', type=int, default=None, help='number of worker processes (default number of CPUs)')
+  parser.add_argument('--paths', action='store_true', help='include the solution actions in the output')
+  parser.add_argument('--profile', action='store_true', help='time the heuristic and successors() calls')
+  parser.add_argument('--output', help='output file (default stdout)')
+  return parser
+
+def main(argv=None):
+  args = make_parser().parse_args(argv)
+
+  if args.boards:
+    boards = load_boards(args.boards)
+  else:
+    boards = [board_to_dict(i, state) for i, state in enumerate(PROBLEMS)]
+  boards = [boards[i] for i in parse_problem_indices(args.problems, len(boards))]
+
+  options = vars(args)
+  out = open(args.output, 'w') if args.output else sys.stdout
+  pool = multiprocessing.Pool(args.processes, maxtasksperchild=1)
+  try:
+    for result in pool.imap_unordered(solve, [(board, options) for board in boards]):
+      out.write(json.dumps(result) + '\n')
+      out.flush()
+  finally:
+    pool.terminate()
+    if out is not sys.stdout:
+      out.close()
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,186 @@
+'''Benchmark of the search strategies, cycle checking levels and heuristics on LunarLockout problems.
+
+Runs every combination of the selected strategies, cycle checking levels and heuristics on each problem (PROBLEMS
+from solution.py, or the boards in a boards file, see batch_solver.py), each run in a fresh process, and records the
+solution cost, the nodes expanded, nodes per second and the peak memory of the process. The totals of each
+combination are printed as a table. The results can be saved as a baseline, and later results compared with it to
+flag regressions, e.g.
+
+  python benchmark.py --timebound 2 --save-baseline baseline.json
+  python benchmark.py --timebound 2 --baseline baseline.json --output results.jsonl
+  python benchmark.py --strategies astar,idastar --cc full --heuristics L,alternate --boards boards.jsonl
+
+A run has regressed if it no longer solves its problem, finds a more expensive solution, or (when both runs solved
+it) expands more nodes, searches fewer nodes per second or takes more memory, beyond the tolerance for those last two
+(they vary from run to run). The exit status is 1 if there are any regressions.
+
+Peak memory is the maximum resident set size of the process (in KB), so it includes the interpreter and the problem
+set; it is not recorded where the resource module is unavailable.
+'''
+
+import argparse
+import json
+import multiprocessing
+import platform
+import sys
+import time
+
+try:
+  import resource
+except ImportError:
+  resource = None
+
+from batch_solver import make_parser, solve, load_boards, board_to_dict, parse_problem_indices, HEURISTICS
+from solution import PROBLEMS
+
+STRATEGIES = ['depth_first', 'breadth_first', 'ucs', 'best_first', 'astar', 'custom', 'idastar', 'beam', 'bounded_best_first']
+#strategies that do not use the heuristic, so are only run with the trivial one
+UNINFORMED_STRATEGIES = ['depth_first', 'breadth_first', 'ucs']
+CC_LEVELS = ['none', 'path', 'full']
+
+#runs shorter than this (in seconds) are too noisy to compare their nodes per second
+MIN_TIMED_RUN = 0.05
+
+def configurations(strategies, cc_levels, heuristics):
+  '''Returns the (strategy, cycle check level, heuristic) combinations to run.'''
+  configs = []
+  for strategy in strategies:
+    for cc in cc_levels:
+      #idastar can at most do path checking
+      if strategy == 'idastar' and cc == 'full':
+        continue
+      for heuristic in heuristics:
+        if strategy in UNINFORMED_STRATEGIES and heuristic != 'trivial':
+          continue
+        configs.append((strategy, cc, heuristic))
+  return configs
+
+def peak_rss():
+  '''Returns the peak resident set size of this process in KB (None if unknown).'''
+  if resource is None:
+    return None
+  rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  #reported in bytes on macOS, KB elsewhere
+  return rss // 1024 if sys.platform == 'darwin' else rss
+
+def run(task):
+  '''Runs one benchmark (a batch_solver task), adding the search rate and peak memory to its results.'''
+  result = solve(task)
+  result['cc'] = task[1]['cc']
+  if 'error' in result:
+    #counted as unsolved, so that it shows in the totals and as a regression
+    print("ERROR: problem {} {} cc={} {}: {}".format(result['id'], result['strategy'], result['cc'], result['heuristic'], result['error']))
+    result.update(solved=False, cost=None, nodes_expanded=0, wall_time=0., nodes_per_sec=None, peak_rss_kb=None)
+    return result
+  result['nodes_per_sec'] = result['nodes_expanded'] / result['wall_time'] if result['wall_time'] > 0 else None
+  result['peak_rss_kb'] = peak_rss()
+  return result
+
+def result_key(result):
+  return (str(result['id']), result['strategy'], result['cc'], result['heuristic'])
+
+def summarize(results, configs, out):
+  '''Prints the totals of each combination.'''
+  out.write('{:<20} {:<5} {:<10} {:>7} {:>7} {:>10} {:>10} {:>10}\n'.format(
+    'strategy', 'cc', 'heuristic', 'solved', 'cost', 'nodes', 'nodes/s', 'peak KB'))
+  for config in configs:
+    runs = [r for r in results if (r['strategy'], r['cc'], r['heuristic']) == config]
+    solved = [r for r in runs if r['solved']]
+    nodes = sum(r['nodes_expanded'] for r in runs)
+    wall_time = sum(r['wall_time'] for r in runs)
+    rss = [r['peak_rss_kb'] for r in runs if r['peak_rss_kb'] is not None]
+    out.write('{:<20} {:<5} {:<10} {:>7} {:>7} {:>10} {:>10} {:>10}\n'.format(
+      config[0], config[1], config[2], '{}/{}'.format(len(solved), len(runs)), sum(r['cost'] for r in solved), nodes,
+      int(nodes / wall_time) if wall_time > 0 else '-', max(rss) if rss else '-'))
+
+def compare(results, baseline, tolerance):
+  '''Returns a list of (key, description) of the regressions of results against the baseline results.'''
+  old_results = dict((result_key(r), r) for r in baseline)
+  regressions = []
+  for new in results:
+    key = result_key(new)
+    old = old_results.get(key)
+    if old is None or not old['solved']:
+      continue
+    if not new['solved']:
+      regressions.append((key, 'no longer solved'))
+      continue
+    if new['cost'] > old['cost']:
+      regressions.append((key, 'cost {} -> {}'.format(old['cost'], new['cost'])))
+    if new['nodes_expanded'] > old['nodes_expanded']:
+      regressions.append((key, 'nodes expanded {} -> {}'.format(old['nodes_expanded'], new['nodes_expanded'])))
+    if (old['wall_time'] >= MIN_TIMED_RUN and old['nodes_per_sec'] and new['nodes_per_sec'] is not None and
+        new['nodes_per_sec'] < old['nodes_per_sec'] * (1 - tolerance)):
+      regressions.append((key, 'nodes/sec {:.0f} -> {:.0f}'.format(old['nodes_per_sec'], new['nodes_per_sec'])))
+    if old['peak_rss_kb'] and new['peak_rss_kb'] and new['peak_rss_kb'] > old['peak_rss_kb'] * (1 + tolerance):
+      regressions.append((key, 'peak memory {} KB -> {} KB'.format(old['peak_rss_kb'], new['peak_rss_kb'])))
+  return regressions
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Benchmark search strategies and heuristics on LunarLockout problems.')
+  parser.add_argument('--boards', help='file of boards (one JSON object per line); defaults to PROBLEMS')
+  parser.add_argument('--problems', help='indices of the problems to run, e.g., "0-4,7" (default all)')
+  parser.add_argument('--strategies', default=','.join(STRATEGIES), help='comma separated strategies (default all)')
+  parser.add_argument('--cc', default=','.join(CC_LEVELS), help='comma separated cycle check levels (default all)')
+  parser.add_argument('--heuristics', default=','.join(sorted(HEURISTICS)), help='comma separated heuristics (default all)')
+  parser.add_argument('--timebound', type=float, default=1., help='time budget per run (seconds)')
+  parser.add_argument('--repeat', type=int, default=1, help='run each benchmark this many times, keeping the fastest')
+  parser.add_argument('--processes', type=int, default=1, help='number of benchmarks run at once (more makes the timings noisier)')
+  parser.add_argument('--baseline', help='baseline file to compare the results with')
+  parser.add_argument('--save-baseline', metavar='FILE', help='write the results to FILE as a baseline')
+  parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative loss of nodes/sec and growth of peak memory')
+  parser.add_argument('--output', help='file to write the result of each run to, as JSON lines')
+  args = parser.parse_args(argv)
+
+  if args.boards:
+    boards = load_boards(args.boards)
+  else:
+    boards = [board_to_dict(i, state) for i, state in enumerate(PROBLEMS)]
+  boards = [boards[i] for i in parse_problem_indices(args.problems, len(boards))]
+  configs = configurations(args.strategies.split(','), args.cc.split(','), args.heuristics.split(','))
+
+  #the solver's options, with its defaults for those the benchmark does not set
+  tasks = []
+  for strategy, cc, heuristic in configs:
+    options = vars(make_parser().parse_args([]))
+    options.update(strategy=strategy, cc=cc, heuristic=heuristic, timebound=args.timebound)
+    for board in boards:
+      tasks.extend([(board, options)] * args.repeat)
+
+  fastest = dict()
+  pool = multiprocessing.Pool(args.processes, maxtasksperchild=1)
+  try:
+    for result in pool.imap(run, tasks):
+      key = result_key(result)
+      if key not in fastest or result['wall_time'] < fastest[key]['wall_time']:
+        fastest[key] = result
+  finally:
+    pool.terminate()
+  results = list(fastest.values())
+
+  if args.output:
+    with open(args.output, 'w') as out:
+      for result in results:
+        out.write(json.dumps(result) + '\n')
+  summarize(results, configs, sys.stdout)
+
+  if args.save_baseline:
+    meta = {'python': platform.python_version(), 'platform': platform.platform(), 'timebound': args.timebound,
+            'date': time.strftime('%Y-%m-%d %H:%M:%S')}
+    with open(args.save_baseline, 'w') as out:
+      json.dump({'meta': meta, 'results': results}, out, indent=1)
+
+  if args.baseline:
+    with open(args.baseline) as f:
+      baseline = json.load(f)
+    if baseline['meta'].get('timebound') != args.timebound:
+      print("Warning: the baseline was run with a timebound of {} seconds".format(baseline['meta'].get('timebound')))
+    regressions = compare(results, baseline['results'], args.tolerance)
+    for key, description in regressions:
+      print("REGRESSION: problem {} {} cc={} {}: {}".format(key[0], key[1], key[2], key[3], description))
+    print("{} regressions against {}".format(len(regressions), args.baseline))
+    if regressions:
+      sys.exit(1)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,134 @@
+'''Generator of random LunarLockout boards with a given optimal solution length.
+
+Each board is found by a breadth first search backwards (with LunarLockoutState.predecessors) from a random goal
+configuration, with every xanadu in the center and the robots anywhere else. A board first reached at depth d can be
+solved in d moves; it is kept if an A* search forwards (with the admissible L distance heuristic) finds that it cannot
+be solved in fewer. Layers of the backward search are sampled down to a fixed width, so that deep boards can be
+reached on large boards. The boards are written as they are found, one JSON object per line in the format of
+batch_solver.py (with their optimal solution length), e.g.
+
+  python generate_boards.py --size 7 --robots 5 --xanadus 1 --length 8-10 --count 50 --seed 1 > boards.jsonl
+  python benchmark.py --boards boards.jsonl --strategies astar --cc full
+'''
+
+import argparse
+import contextlib
+import json
+import random
+import sys
+
+from search import SearchEngine
+from lunarlockout import LunarLockoutState, lockout_goal_state
+from solution import heur_L_distance
+from batch_solver import board_to_dict
+
+def parse_lengths(spec):
+  '''Returns the list of lengths described by spec, e.g., "8" or "8-10".'''
+  if '-' in spec:
+    first, last = spec.split('-')
+    return list(range(int(first), int(last) + 1))
+  return [int(spec)]
+
+def random_goal(size, num_robots, num_xanadus, rng):
+  '''Returns a goal state with the xanadus in the center and the robots on distinct random cells.'''
+  center = (size - 1) // 2
+  cells = [(x, y) for y in range(size) for x in range(size) if (x, y) != (center, center)]
+  robots = tuple(rng.sample(cells, num_robots))
+  return LunarLockoutState("START", 0, None, size, robots, ((center, center),) * num_xanadus)
+
+def optimal_length(state, timebound):
+  '''Returns the optimal solution length of state (None if not found within timebound seconds).'''
+  se = SearchEngine('astar', 'full')
+  se.init_search(state, lockout_goal_state, heur_L_distance)
+  #what the search prints (e.g., on running out of time) must not end up among the boards written to stdout
+  with contextlib.redirect_stdout(sys.stderr):
+    final = se.search(timebound)
+  return final.gval if final else None
+
+def generate(size, num_robots, num_xanadus, lengths, rng, width = 1000, samples = 3, timebound = 10., max_goals = 1000):
+  '''
+  Generates boards (as (initial state, optimal length) pairs) of the given size and pieces whose optimal solution
+  length is one of lengths. The shortest of lengths that is found from a goal configuration is used. Stops after
+  max_goals goal configurations in a row yield no board (e.g., when no board has any of lengths).
+  @param width: The number of states of each layer of a backward search that are kept.
+  @param samples: The number of boards of each layer with a length in lengths that are checked.
+  @param timebound: The time (in seconds) allowed for checking the length of a board.
+  '''
+  center = (size - 1) // 2
+  failures = 0
+  while failures < max_goals:
+    goal = random_goal(size, num_robots, num_xanadus, rng)
+    layer = [goal]
+    seen = set([goal.hashable_state()])
+    found = None
+    for depth in range(1, max(lengths) + 1):
+      next_layer = []
+      for state in layer:
+        for predecessor in state.predecessors():
+          hash_state = predecessor.hashable_state()
+          if not hash_state in seen:
+            seen.add(hash_state)
+            next_layer.append(predecessor)
+      if len(next_layer) > width:
+        next_layer = rng.sample(next_layer, width)
+      layer = next_layer
+      if not layer:
+        break
+      if not depth in lengths:
+        continue
+
+      #boards with a xanadu already in the center are left out
+      candidates = [state for state in layer if not (center, center) in state.xanadus]
+      for state in rng.sample(candidates, min(samples, len(candidates))):
+        #a fresh initial state, without the backward search's parents
+        state = LunarLockoutState("START", 0, None, size, state.robots, state.xanadus)
+        if optimal_length(state, timebound) == depth:
+          found = state
+          break
+      #one board from each goal, as boards found from the same goal look alike
+      if found:
+        break
+    if found:
+      failures = 0
+      yield found, depth
+    else:
+      failures += 1
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Generate random LunarLockout boards, writing JSON lines.')
+  parser.add_argument('--size', type=int, default=5, help='board dimension (odd)')
+  parser.add_argument('--robots', type=int, default=4, help='number of robots')
+  parser.add_argument('--xanadus', type=int, default=1, help='number of xanadus')
+  parser.add_argument('--length', default='8', help='optimal solution length, or range of lengths, e.g., "8-10"')
+  parser.add_argument('--count', type=int, default=10, help='number of boards to generate')
+  parser.add_argument('--seed', type=int, default=None, help='random seed (for reproducible boards)')
+  parser.add_argument('--width', type=int, default=1000, help='states kept in each layer of the backward search')
+  parser.add_argument('--max-goals', type=int, default=1000, help='goal configurations in a row tried without finding a board before giving up')
+  parser.add_argument('--timebound', type=float, default=10., help='time allowed to check the length of a board (seconds)')
+  parser.add_argument('--output', help='output file (default stdout)')
+  args = parser.parse_args(argv)
+
+  if args.size % 2 == 0 or args.robots + args.xanadus > args.size * args.size - 1:
+    parser.error("boards must have an odd dimension and room for all the pieces")
+  rng = random.Random(args.seed)
+  lengths = parse_lengths(args.length)
+  out = open(args.output, 'w') if args.output else sys.stdout
+  try:
+    boards = generate(args.size, args.robots, args.xanadus, lengths, rng, args.width, timebound=args.timebound,
+                      max_goals=args.max_goals)
+    for i in range(args.count):
+      state, length = next(boards, (None, None))
+      if state is None:
+        print("No board of length {} found from {} goal configurations; stopping after {} boards".format(
+          args.length, args.max_goals, i), file=sys.stderr)
+        break
+      board = board_to_dict(i, state)
+      board['length'] = length
+      out.write(json.dumps(board) + '\n')
+      out.flush()
+  finally:
+    if out is not sys.stdout:
+      out.close()
+
+if __name__ == "__main__":
+  main()
@@ -3,6 +3,8 @@
     A) Class LunarLockoutState
 
     A specializion of the StateSpace Class that is tailored to the game of LunarLockout.
+    The positions of all pieces are packed into a single integer (see class BoardLayout),
+    which is also used to hash states.
 
     B) class Direction
 
@@ -14,6 +16,101 @@
 from search import *
 import random 
 
+class SlideTable(dict):
+    '''
+    Maps the bitmask of the occupied cells of a row (or column) to a tuple with, for each position in the row,
+    a pair (destination sliding towards 0, destination sliding away from 0). A destination is -1 if the piece
+    cannot move that way, i.e., there is no piece to stop it or the nearest piece is adjacent. Entries are
+    computed the first time a mask is seen.
+    '''
+
+    tables = dict()
+
+    def __init__(self, size):
+        dict.__init__(self)
+        self.size = size
+
+    def __missing__(self, mask):
+        destinations = []
+        for pos in range(self.size):
+          below = mask & ((1 << pos) - 1)
+          #stop just above the nearest piece below pos
+          low = below.bit_length() if below else -1
+          if low == pos:
+            low = -1
+          above = mask >> (pos + 1)
+          #stop just below the nearest piece above pos
+          high = pos + (above & -above).bit_length() - 1 if above else -1
+          if high == pos:
+            high = -1
+          destinations.append((low, high))
+        destinations = tuple(destinations)
+        self[mask] = destinations
+        return destinations
+
+class BoardLayout():
+    '''
+    Describes how the pieces of a LunarLockout board are packed into an integer. Each coordinate takes a
+    field of bits wide enough for the board size; the robots come first (robot 0 in the lowest bits) followed
+    by the xanadus. All states of a problem share one layout object.
+    '''
+
+    layouts = dict()
+
+    def __init__(self, size, num_robots, num_xanadus, single_xanadu):
+        self.size = size
+        self.num_robots = num_robots
+        self.num_xanadus = num_xanadus
+        #True if the xanadus are given as a single (x, y) location rather than a tuple of locations
+        self.single_xanadu = single_xanadu
+        self.bits = max(1, (size-1).bit_length())
+        self.mask = (1 << self.bits) - 1
+        #(x shift, y shift) of each piece; robots first, then xanadus
+        self.shifts = tuple((2*i*self.bits, (2*i+1)*self.bits) for i in range(num_robots + num_xanadus))
+        self.robot_shifts = self.shifts[:num_robots]
+        self.xanadu_shifts = self.shifts[num_robots:]
+        #masks that clear the fields of each piece
+        self.clear_masks = tuple(~((self.mask << xs) | (self.mask << ys)) for xs, ys in self.shifts)
+        #number of bytes of a packed state (see LunarLockoutState.pack_state)
+        self.packed_bytes = (2 * self.bits * len(self.shifts) + 7) // 8
+        self.slides = SlideTable.tables.get(size)
+        if self.slides is None:
+          self.slides = SlideTable.tables[size] = SlideTable(size)
+        #the cell (y*size + x) each cell is taken to by the 8 rotations and reflections of the board
+        last = size - 1
+        transforms = (lambda x, y: (x, y), lambda x, y: (last-x, y), lambda x, y: (x, last-y), lambda x, y: (last-x, last-y),
+                      lambda x, y: (y, x), lambda x, y: (last-y, x), lambda x, y: (y, last-x), lambda x, y: (last-y, last-x))
+        self.symmetries = tuple(tuple(ty*size + tx for tx, ty in (transform(x, y) for y in range(size) for x in range(size)))
+                                for transform in transforms)
+        #for each cell, its smallest image under the symmetries and the symmetries that take it there
+        self.orbits = []
+        for cell in range(size * size):
+          smallest = min(symmetry[cell] for symmetry in self.symmetries)
+          self.orbits.append((smallest, tuple(symmetry for symmetry in self.symmetries if symmetry[cell] == smallest)))
+
+    @staticmethod
+    def get(size, num_robots, num_xanadus, single_xanadu):
+        '''Returns the (shared) layout for the given board size and pieces.'''
+        key = (size, num_robots, num_xanadus, single_xanadu)
+        layout = BoardLayout.layouts.get(key)
+        if layout is None:
+          layout = BoardLayout.layouts[key] = BoardLayout(size, num_robots, num_xanadus, single_xanadu)
+        return layout
+
+    def pack(self, robots, xanadus):
+        '''Returns the integer encoding of the given robot and xanadu locations.'''
+        if self.single_xanadu:
+          xanadus = (xanadus,)
+        code = 0
+        for (x, y), (xs, ys) in zip(tuple(robots) + tuple(xanadus), self.shifts):
+          code |= (x << xs) | (y << ys)
+        return code
+
+    def move(self, code, piece, location):
+        '''Returns the encoding of code with the given piece (robots first, then xanadus) moved to location.'''
+        xs, ys = self.shifts[piece]
+        return (code & self.clear_masks[piece]) | (location[0] << xs) | (location[1] << ys)
+
 class LunarLockoutState(StateSpace):
 
     def __init__(self, action, gval, parent, size, robots, xanadus):
@@ -30,11 +127,54 @@ class LunarLockoutState(StateSpace):
           print("Boards must be of odd dimension. Board has been enlardged by one block.")
 
         StateSpace.__init__(self, action, gval, parent)
-        self.width = size
-        self.height = size
+        single_xanadu = isinstance(xanadus[0], int)
+        self.layout = BoardLayout.get(size, len(robots), 1 if single_xanadu else len(xanadus), single_xanadu)
+        self.code = self.layout.pack(robots, xanadus)
 
-        self.robots = robots 
-        self.xanadus = xanadus 
+    def moved(self, action, gval, piece, location):
+        '''
+        Returns the successor (or predecessor) of this state in which a single piece has moved.
+        @param action: The name of the action.
+        @param gval: The gval of the new state.
+        @param piece: The index of the piece; robots first, then xanadus.
+        @param location: The new location of the piece.
+        '''
+        new_state = LunarLockoutState.__new__(LunarLockoutState)
+        StateSpace.__init__(new_state, action, gval, self)
+        new_state.layout = self.layout
+        new_state.code = self.layout.move(self.code, piece, location)
+        return new_state
+
+    @property
+    def width(self):
+        return self.layout.size
+
+    @property
+    def height(self):
+        return self.layout.size
+
+    @property
+    def robots(self):
+        '''A tuple of all the robots' locations, decoded from the packed state.'''
+        code = self.code
+        mask = self.layout.mask
+        return tuple(((code >> xs) & mask, (code >> ys) & mask) for xs, ys in self.layout.robot_shifts)
+
+    @property
+    def xanadus(self):
+        '''A tuple of all the xanadus' locations (or a single location), decoded from the packed state.'''
+        code = self.code
+        mask = self.layout.mask
+        xanadus = tuple(((code >> xs) & mask, (code >> ys) & mask) for xs, ys in self.layout.xanadu_shifts)
+        if self.layout.single_xanadu:
+          return xanadus[0]
+        return xanadus
+
+    def __eq__(self, other):
+        return isinstance(other, LunarLockoutState) and self.code == other.code and self.layout is other.layout
+
+    def __hash__(self):
+        return hash(self.code)
 
     def getRobots(self):
       return self.robots
@@ -43,88 +183,151 @@ class LunarLockoutState(StateSpace):
     def successors(self):
         '''
         Generates all the actions that can be performed from this state, and the states those actions will create.        
+        The occupied cells of each row and column are kept as bitmasks, and the destination of a slide is looked up
+        in the layout's slide table (see SlideTable).
         '''
 
         successors = []
         transition_cost = 1
-        center = int((self.width-1)/2)
-
-        for robot in range(0, len(self.robots)):
-          other_robots = list(self.robots);
-          other_robots.remove(self.robots[robot])
+        layout = self.layout
+        slides = layout.slides
+        center = int((layout.size-1)/2)
+        robots = self.robots
+
+        #xanadus that are already in the center neither move nor block other pieces
+        pieces = [(robot, chr(ord('a') + robot), location) for robot, location in enumerate(robots)]
+        if layout.single_xanadu:
+          pieces.append((len(robots), 'A', self.xanadus))
+        else:
+          for robot, xanadu in enumerate(self.xanadus):
+            if xanadu[0] != center or xanadu[1] != center:
+              pieces.append((len(robots) + robot, chr(ord('A') + robot), xanadu))
+
+        rows = [0] * layout.size
+        cols = [0] * layout.size
+        for _, _, (x, y) in pieces:
+          rows[y] |= 1 << x
+          cols[x] |= 1 << y
+
+        for piece, name, location in pieces:
+          x, y = location
+          up, down = slides[cols[x]][y]
+          left, right = slides[rows[y]][x]
+          if up >= 0:
+            successors.append(self.moved(name + " " + UP.name, self.gval + transition_cost, piece, (x, up)))
+          if right >= 0:
+            successors.append(self.moved(name + " " + RIGHT.name, self.gval + transition_cost, piece, (right, y)))
+          if down >= 0:
+            successors.append(self.moved(name + " " + DOWN.name, self.gval + transition_cost, piece, (x, down)))
+          if left >= 0:
+            successors.append(self.moved(name + " " + LEFT.name, self.gval + transition_cost, piece, (left, y)))
 
-          if(isinstance(self.xanadus[0],int)):
-            other_robots = tuple(other_robots) + (self.xanadus,)
-          else:
-            # remove any xanadus that are already in the center
-            xanadubots = [i for i in self.xanadus if i[0] != center or i[1] != center]            
-            other_robots = tuple(other_robots) + tuple(xanadubots)
+        return successors
 
-          for direction in (UP, RIGHT, DOWN, LEFT):
+    def predecessors(self):
+        '''
+        Generates all the states from which a single action leads to this state (used for bidirectional search).
+        A piece that slid in some direction stopped next to a piece beyond it, and it may have started from any
+        cell behind it up to the nearest piece. A xanadu that is in the center may have slid into it (provided
+        no robot now covers the center).
+        '''
 
-              new_location = direction.move(self.robots[robot], other_robots)
-              if new_location == None:
-                continue
-              if new_location[0] < 0 or new_location[0] >= self.width:
-                  continue
-              if new_location[1] < 0 or new_location[1] >= self.height:
-                  continue
-              if new_location in other_robots:
-                  continue
+        predecessors = []
+        transition_cost = 1
+        center = int((self.width-1)/2)
+        robots = self.robots
+        single_xanadu = self.layout.single_xanadu
+        xanadus = (self.xanadus,) if single_xanadu else self.xanadus
 
-              new_robots = list(self.robots)
-              new_robots[robot] = new_location
-              new_robots = tuple(new_robots)
+        #pieces that block movement; xanadus in the center have left the board
+        blockers = set(robots)
+        for xanadu in xanadus:
+          if single_xanadu or xanadu[0] != center or xanadu[1] != center:
+            blockers.add(tuple(xanadu))
 
-              new_state = LunarLockoutState(chr(ord('a') + robot) + " " + direction.name, self.gval + transition_cost, self, self.width, new_robots, self.xanadus)
-              successors.append(new_state)
+        pieces = [(chr(ord('a') + i), robot) for i, robot in enumerate(robots)]
+        pieces += [(chr(ord('A') + i), tuple(xanadu)) for i, xanadu in enumerate(xanadus)]
 
-        if(isinstance(self.xanadus[0],int)):
-          stop_index = 1
-        else:
-          stop_index = len(self.xanadus)
+        for piece, (name, location) in enumerate(pieces):
+          in_center = location[0] == center and location[1] == center
+          if piece >= len(robots) and not single_xanadu and in_center and location in blockers:
+            #a xanadu in the center with a robot on top of it, which must have arrived later
+            continue
 
-        for robot in range(0, stop_index):
-          other_robots = list(self.xanadus);
-          if(isinstance(other_robots[0],int)):
-            other_robots = self.robots
-            xanadu = self.xanadus
-          else:
-            xanadu = self.xanadus[robot]
-            if xanadu[0] == center and xanadu[1] == center:
-              continue
-            other_robots.remove(self.xanadus[robot])
-            other_robots = [x for x in other_robots if (x[0]!=center or x[1]!=center)]
-            other_robots = tuple(other_robots) + self.robots            
-            
           for direction in (UP, RIGHT, DOWN, LEFT):
-              new_location = direction.move(xanadu, other_robots)
+            dx, dy = direction.delta
+            #the piece stopped here, so there must have been a blocker in front of it
+            if (location[0] + dx, location[1] + dy) not in blockers:
+              continue
 
-              if new_location == None:
+            x, y = location[0] - dx, location[1] - dy
+            while 0 <= x < self.width and 0 <= y < self.height and (x, y) not in blockers:
+              if piece >= len(robots) and not single_xanadu and x == center and y == center:
+                #a xanadu can pass over the center, but could not have started a move in it
+                x, y = x - dx, y - dy
                 continue
-              if new_location[0] < 0 or new_location[0] >= self.width:
-                  continue
-              if new_location[1] < 0 or new_location[1] >= self.height:
-                  continue
-              if new_location in other_robots:
-                if new_location[0] != center and new_location[1] != center:
-                  continue
-
-              if (isinstance(self.xanadus[0], int)):
-                new_xanadus = new_location
-              else:
-                new_xanadus = list(self.xanadus)
-                new_xanadus[robot] = new_location
-                new_xanadus = tuple(new_xanadus)
-
-              new_state = LunarLockoutState(chr(ord('A') + robot) + " " + direction.name, self.gval + transition_cost, self, self.width, self.robots, new_xanadus)
-              successors.append(new_state)
+              new_state = self.moved(name + " " + direction.name, self.gval + transition_cost, piece, (x, y))
+              predecessors.append(new_state)
+              x, y = x - dx, y - dy
 
-        return successors
+        return predecessors
 
     def hashable_state(self):
         '''Return a data item that can be used as a dictionary key to UNIQUELY represent a state.'''
-        return hash((self.robots, self.xanadus))       
+        return self.code
+
+    def canonical_state(self):
+        '''
+        Returns the same value for all states that are rotations or reflections of each other, or that only
+        differ in which robot (or xanadu) is where, as these take the same number of moves to solve: the
+        smallest, over the symmetries of the board, of the sorted xanadu cells followed by the sorted robot cells
+        packed into an integer.
+        '''
+        layout = self.layout
+        size = layout.size
+        cells = size * size
+        code = self.code
+        mask = layout.mask
+        xanadus = [((code >> ys) & mask) * size + ((code >> xs) & mask) for xs, ys in layout.xanadu_shifts]
+
+        #the xanadus come first in the key, so only the symmetries that give the smallest xanadu cells (usually
+        #just one) need to be tried on the robots
+        if len(xanadus) == 1:
+          best, candidates = layout.orbits[xanadus[0]]
+        else:
+          best = None
+          for symmetry in layout.symmetries:
+            key = 0
+            for cell in sorted([symmetry[c] for c in xanadus]):
+              key = key * cells + cell
+            if best is None or key < best:
+              best = key
+              candidates = [symmetry]
+            elif key == best:
+              candidates.append(symmetry)
+
+        robots = [((code >> ys) & mask) * size + ((code >> xs) & mask) for xs, ys in layout.robot_shifts]
+        xanadu_key = best
+        best = None
+        for symmetry in candidates:
+          key = xanadu_key
+          for cell in sorted([symmetry[c] for c in robots]):
+            key = key * cells + cell
+          if best is None or key < best:
+            best = key
+        return best
+
+    def pack_state(self):
+        '''Returns the encoding of the state as bytes (big-endian, so they sort as the encodings do).'''
+        return self.code.to_bytes(self.layout.packed_bytes, 'big')
+
+    def unpack_state(self, data):
+        '''Returns the state packed into data by pack_state, as an initial state.'''
+        state = LunarLockoutState.__new__(LunarLockoutState)
+        StateSpace.__init__(state, "START", 0, None)
+        state.layout = self.layout
+        state.code = int.from_bytes(data, 'big')
+        return state
 
     def state_string(self):
         '''Returns a string representation fo a state that can be printed to stdout.'''        
@@ -191,6 +394,44 @@ def lockout_goal_state(state):
 
   return True
 
+def lockout_dead_state(state):
+  '''
+  Returns True if the state provably cannot be solved (for use as the dead_fn of SearchEngine.init_search).
+  A slide stops next to the piece that blocked it, so no move takes a piece outside of the bounding box of the
+  pieces on the board, and the box never grows. The last move of a xanadu into the center is blocked by a piece
+  beyond the center, so the center must be strictly inside the box across or down (and inside it the other way).
+  The state is also dead if no two pieces share a row or column, as then no piece can move at all.
+  '''
+  layout = state.layout
+  code = state.code
+  mask = layout.mask
+  center = (layout.size - 1) // 2
+
+  #the columns and rows holding pieces, as bitmasks. Xanadus in the center have left the board (unless there is
+  #only one, when the state is a goal)
+  columns = rows = pieces = 0
+  for xs, ys in layout.xanadu_shifts:
+    x, y = (code >> xs) & mask, (code >> ys) & mask
+    if x != center or y != center:
+      columns |= 1 << x
+      rows |= 1 << y
+      pieces += 1
+  if not pieces:
+    return False
+  for xs, ys in layout.robot_shifts:
+    columns |= 1 << ((code >> xs) & mask)
+    rows |= 1 << ((code >> ys) & mask)
+    pieces += 1
+
+  #the bounding box is given by the lowest and highest bits of the masks
+  min_x, max_x = (columns & -columns).bit_length() - 1, columns.bit_length() - 1
+  min_y, max_y = (rows & -rows).bit_length() - 1, rows.bit_length() - 1
+  if not (min_x <= center <= max_x and min_y <= center <= max_y):
+    return True
+  if not (min_x < center < max_x or min_y < center < max_y):
+    return True
+  return bin(columns).count('1') == pieces and bin(rows).count('1') == pieces
+
 #LunarLockout Directions: encodes directions of movement that are possible for each robot.
 class Direction():
     '''
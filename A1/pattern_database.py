@@ -0,0 +1,237 @@
+'''Pattern databases for LunarLockout.
+
+    A pattern database stores, for every placement of one xanadu and k robots (the pattern) on a board, the
+    exact number of moves needed to bring the xanadu to the center in an abstraction of the game. It is
+    computed once by a breadth first search backwards from the goal placements, written to a file of one
+    byte per placement, and memory-mapped when loaded, e.g.
+
+      python pattern_database.py --size 5 --robots 3 --output lockout_5_3.pdb
+
+    A) The abstraction
+
+    Pieces outside of the pattern (the other robots and xanadus) are not tracked. Since one of them may be
+    anywhere, a pattern piece sliding in some direction may stop at any cell before the first pattern piece
+    in its way, provided the cell beyond it is on the board. Every move of the game either moves a pattern
+    piece in this way or leaves the pattern unchanged, so only moves of pattern pieces are counted. The
+    distance of a placement is therefore a lower bound on the number of moves of its pieces in any solution,
+    and the distances of patterns with no pieces in common can be added. A placement from which the
+    xanadu cannot reach the center in the abstraction cannot be solved at all (a dead state).
+
+    B) class PatternDatabase
+
+    Holds the table of distances; use heuristic() to get a LunarLockout heuristic function.
+'''
+
+import argparse
+import mmap
+import struct
+from itertools import combinations
+
+_MAGIC = b'LLPDB1'
+_HEADER = struct.Struct('<6sHH')
+#distances are stored in a byte, with this value for placements from which the center cannot be reached
+UNREACHABLE = 255
+#heuristic value of dead states, as in heur_alternate
+DEAD_STATE = 2**30
+
+_DIRECTIONS = ((0, -1), (1, 0), (0, 1), (-1, 0))
+
+def _binomials(n, k):
+  '''Returns a table of the binomial coefficients C(i, j) for 0 <= i <= n and 0 <= j <= k.'''
+  table = [[0] * (k + 1) for _ in range(n + 1)]
+  for i in range(n + 1):
+    table[i][0] = 1
+    for j in range(1, min(i, k) + 1):
+      table[i][j] = table[i-1][j-1] + (table[i-1][j] if j <= i - 1 else 0)
+  return table
+
+class PatternDatabase():
+    '''
+    The distances of all placements of one xanadu and num_robots robots on a size x size board. Cells are
+    numbered y*size + x. A placement is indexed by the xanadu cell followed by the rank of the set of robot
+    cells (in colexicographic order), so the robots are interchangeable.
+    '''
+
+    def __init__(self, size, num_robots, table):
+        '''
+        @param size: The board's dimension.
+        @param num_robots: The number of robots in the pattern.
+        @param table: The distances, a bytes-like object of length size*size*C(size*size, num_robots).
+        '''
+        self.size = size
+        self.num_robots = num_robots
+        self.cells = size * size
+        self.center = (size // 2) * size + size // 2
+        self.binomials = _binomials(self.cells, num_robots)
+        self.placements = self.binomials[self.cells][num_robots]
+        if len(table) != self.cells * self.placements:
+          raise ValueError("Pattern database table has {} entries, expected {}".format(len(table), self.cells * self.placements))
+        self.table = table
+
+    def index(self, xanadu, robots):
+        '''Returns the table index of a placement, given the xanadu cell and the sorted robot cells.'''
+        binomials = self.binomials
+        rank = 0
+        for i, cell in enumerate(robots):
+          rank += binomials[cell][i + 1]
+        return xanadu * self.placements + rank
+
+    def distance(self, xanadu, robots):
+        '''Returns the distance of a placement given as cells (None if the center cannot be reached).'''
+        if xanadu == self.center:
+          return 0
+        d = self.table[self.index(xanadu, sorted(robots))]
+        return None if d == UNREACHABLE else d
+
+    @staticmethod
+    def build(size, num_robots, trace = False):
+        '''Computes the pattern database of the given board size and number of robots.'''
+        cells = size * size
+        center = (size // 2) * size + size // 2
+        table = bytearray([UNREACHABLE]) * (cells * _binomials(cells, num_robots)[cells][num_robots])
+        pdb = PatternDatabase(size, num_robots, table)
+
+        #in a goal placement the xanadu is in the center (and has left the board); the robots are anywhere
+        layer = []
+        for robots in combinations(range(cells), num_robots):
+          table[pdb.index(center, robots)] = 0
+          if center not in robots:
+            layer.append((center, robots))
+
+        distance = 0
+        while layer:
+          if trace:
+            print("   TRACE: {} placements at distance {}".format(len(layer), distance))
+          distance += 1
+          if distance >= UNREACHABLE:
+            break
+          next_layer = []
+          for placement in layer:
+            for xanadu, robots in pdb._predecessors(placement):
+              i = pdb.index(xanadu, robots)
+              if table[i] == UNREACHABLE:
+                table[i] = distance
+                next_layer.append((xanadu, robots))
+          layer = next_layer
+        return pdb
+
+    def _predecessors(self, placement):
+        '''Returns the placements (xanadu cell, sorted robot cells) from which a single move of the abstraction
+        leads to placement. In a goal placement only the xanadu may have moved.'''
+        size = self.size
+        xanadu, robots = placement
+        occupied = set(robots)
+        occupied.add(xanadu)
+        pieces = [xanadu] if xanadu == self.center else [xanadu] + list(robots)
+
+        predecessors = []
+        for piece, cell in enumerate(pieces):
+          x, y = cell % size, cell // size
+          for dx, dy in _DIRECTIONS:
+            #the piece slid in direction (dx, dy) and stopped at cell, so the cell beyond it is on the board
+            if not (0 <= x + dx < size and 0 <= y + dy < size):
+              continue
+            #it started from any cell behind it, up to the nearest pattern piece
+            px, py = x - dx, y - dy
+            while 0 <= px < size and 0 <= py < size and py * size + px not in occupied:
+              start = py * size + px
+              if piece == 0:
+                predecessors.append((start, robots))
+              else:
+                moved = list(robots)
+                moved[piece - 1] = start
+                predecessors.append((xanadu, tuple(sorted(moved))))
+              px, py = px - dx, py - dy
+        return predecessors
+
+    def save(self, path):
+        '''Writes the pattern database to a file (a header followed by one byte per placement).'''
+        with open(path, 'wb') as f:
+          f.write(_HEADER.pack(_MAGIC, self.size, self.num_robots))
+          f.write(self.table)
+
+    @staticmethod
+    def load(path):
+        '''Returns the pattern database in a file written by save. The table is memory-mapped rather than read,
+        so processes loading the same file share its pages.'''
+        with open(path, 'rb') as f:
+          magic, size, num_robots = _HEADER.unpack(f.read(_HEADER.size))
+          if magic != _MAGIC:
+            raise ValueError("{} is not a LunarLockout pattern database".format(path))
+          data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return PatternDatabase(size, num_robots, memoryview(data)[_HEADER.size:])
+
+    def heuristic(self, combine = 'add'):
+        '''
+        Returns a LunarLockout heuristic function (for boards of this size) that looks up patterns made of a
+        xanadu that is not in the center and num_robots of the robots. Dead states get the value 2**30.
+        @param combine: 'max' takes the largest distance of any pattern, over all xanadus and all subsets of
+        the robots. 'add' gives each xanadu its own robots (the first num_robots robots to the first xanadu,
+        and so on) and adds up the distances of these disjoint patterns; a xanadu left without enough robots
+        adds its distance with no robots (its L distance). With a single xanadu left both are the same.
+        '''
+        if not combine in ['max', 'add']:
+          raise ValueError("Unknown pattern combination {}, must be one of 'max' or 'add'".format(combine))
+        size = self.size
+        center = self.center
+        k = self.num_robots
+        table = self.table
+        placements = self.placements
+        binomials = self.binomials
+        center_row = size // 2
+
+        def lookup(xanadu, robots):
+          rank = 0
+          for i, cell in enumerate(robots):
+            rank += binomials[cell][i + 1]
+          return table[xanadu * placements + rank]
+
+        def heur_pattern_database(state):
+          '''pattern database LunarLockout heuristic'''
+          xanadus = state.xanadus
+          if isinstance(xanadus[0], int):
+            xanadus = (xanadus,)
+          xanadus = [y * size + x for x, y in xanadus if y * size + x != center]
+          if not xanadus:
+            return 0
+          robots = [y * size + x for x, y in state.robots]
+
+          if combine == 'max' or len(xanadus) == 1:
+            best = 0
+            for pattern in combinations(sorted(robots), k):
+              for xanadu in xanadus:
+                d = lookup(xanadu, pattern)
+                if d == UNREACHABLE:
+                  return DEAD_STATE
+                if d > best:
+                  best = d
+            return best
+
+          total = 0
+          for i, xanadu in enumerate(xanadus):
+            pattern = robots[i*k:(i+1)*k]
+            if len(pattern) == k:
+              d = lookup(xanadu, sorted(pattern))
+              if d == UNREACHABLE:
+                return DEAD_STATE
+              total += d
+            else:
+              total += (xanadu % size != center_row) + (xanadu // size != center_row)
+          return total
+
+        return heur_pattern_database
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Build a LunarLockout pattern database.')
+  parser.add_argument('--size', type=int, default=5, help='board dimension (odd)')
+  parser.add_argument('--robots', type=int, default=3, help='number of robots in the pattern')
+  parser.add_argument('--output', help='output file (default lockout_<size>_<robots>.pdb)')
+  args = parser.parse_args(argv)
+
+  pdb = PatternDatabase.build(args.size, args.robots, trace=True)
+  path = args.output or 'lockout_{}_{}.pdb'.format(args.size, args.robots)
+  pdb.save(path)
+  print("Wrote {} placements to {}".format(len(pdb.table), path))
+
+if __name__ == "__main__":
+  main()
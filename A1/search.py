@@ -18,6 +18,12 @@
       include information specific to that problem. See WaterJugs.py for an
       example, and the Class implementation for more details.
 
+      Problems whose actions can be inverted may also implement
+      predecessors(), which allows the search engine to search
+      bidirectionally (from the initial state and from a goal state).
+      Problems with symmetries may implement canonical_state(), which
+      allows full cycle checking to treat symmetric states as duplicates.
+
 
     B) class SearchEngine
 
@@ -36,10 +42,36 @@
       search (using the init_search method) and resume the search after
       a goal is found (using searchOpen). See the implementation for details. 
 
+      Searches are bounded in time by Deadline objects, which measure
+      either CPU time or (monotonic) wall clock time and can be cancelled
+      from another thread.
+
+      To save memory on large searches, the search tree can instead be
+      kept in a compact NodeArena (see SearchEngine.set_node_storage).
+
+      Each search also records its statistics in a SearchStats object
+      (see search's return_stats), and callbacks for node expansion,
+      generation and pruning can be registered with set_callbacks.
+
+      Breadth first search of problems whose states can be packed into
+      fixed size records (see StateSpace.pack_state) can keep its layers
+      on disk instead of in memory (see SearchEngine.set_external_memory).
+
+      astar can also run as a hash distributed A* search over several
+      processes (see SearchEngine.set_parallel).
+
     '''
 import heapq
-from collections import deque
+from array import array
+from collections import deque, OrderedDict
+from itertools import count
+import copy
+import multiprocessing
 import os
+import queue
+import shutil
+import tempfile
+from time import perf_counter, monotonic
 
 class StateSpace:
     '''Abstract class for defining State spaces for search routines'''
@@ -69,6 +101,16 @@ class StateSpace:
            Also any problem specific data must be specified property.'''        
         raise Exception("Must be overridden in subclass.")
 
+    def predecessors(self):
+        '''This method is optional. When implemented it must return a
+           list of predecessor states, i.e., the states from which some
+           action leads to self. Each predecessor state has "action" the
+           name of the action that leads from it to self, "gval" the gval
+           of self plus the cost of that action (so gvals count the cost
+           of reaching the goal backwards), and parent set to self.
+           Returning None indicates that predecessors are not provided.'''
+        return None
+
     def hashable_state(self):
         '''This method must return an immutable and unique representation
            of the state represented by self. The return value, e.g., a
@@ -77,6 +119,32 @@ class StateSpace:
            if and only if obj1 and obj2 represent the same problem state.'''
         raise Exception("Must be overridden in subclass.")
 
+    def canonical_state(self):
+        '''This method is optional. It must return an immutable
+           representation that is the same for self and every state
+           symmetric to it, i.e., every state with the same cost of
+           reaching a goal (e.g., a rotation of the board of a puzzle
+           whose goal is unchanged by rotations). It is used in place of
+           hashable_state() for full cycle checking when symmetry
+           reduction is on (see SearchEngine.set_symmetry_reduction).
+           By default there are no symmetries.'''
+        return self.hashable_state()
+
+    def pack_state(self):
+        '''This method is optional. It must return a bytes object that
+           uniquely represents the state, of the same length for every
+           state of the problem, from which unpack_state() can recreate
+           the state. It is used by external memory breadth first search
+           (see SearchEngine.set_external_memory). Returning None
+           indicates that packing is not provided.'''
+        return None
+
+    def unpack_state(self, data):
+        '''This method is optional (see pack_state). It must return the
+           state packed into data, of the same problem as self, as if it
+           were an initial state (action "START", gval 0 and no parent).'''
+        raise Exception("Must be overridden in subclass.")
+
     def print_state(self):
         '''Print a representation of the state'''
         raise Exception("Must be overridden in subclass.")
@@ -112,6 +180,9 @@ _BEST_FIRST = 2
 _ASTAR = 3
 _UCS = 4
 _CUSTOM = 5
+_IDASTAR = 6
+_BEAM = 7
+_BOUNDED_BEST_FIRST = 8
 
 #For best first and astar we use a priority queue. This requires
 #a comparison function for nodes. These constants indicate if we use
@@ -121,6 +192,15 @@ _H = 1
 _G = 2
 _C = 3
 
+#Frontier (OPEN) implementation for the priority queue strategies. Either
+#_FRONTIER_HEAP 'heap' (binary heap over sNodes) or _FRONTIER_BUCKET 'bucket'
+#(a bucket queue: one LIFO bucket per priority value, sub-divided by gval)
+#or _FRONTIER_INDEXED 'indexed' (a binary heap indexed by state that holds
+#at most one node per state, supporting decrease-key).
+_FRONTIER_HEAP = 0
+_FRONTIER_BUCKET = 1
+_FRONTIER_INDEXED = 2
+
 #Cycle Checking. Either CC_NONE 'none' (no cycle checking), CC_PATH
 #'path' (path checking only) or CC_FULL 'full' (full cycle checking,
 #remembering all previously visited nodes).
@@ -185,6 +265,72 @@ class sNode:
         #return default of lowest gval (generating UCS behavior)
         return self.gval < other.gval
 
+class NodeArena:
+    '''Compact storage of a search tree. For each node the index of its
+       parent node, the id of the action that generated it and its gval
+       are kept in parallel arrays, with node 0 the initial state (root).
+       A search that uses an arena drops the parent pointers of the states
+       it generates, so that a state is freed once it has been expanded
+       and removed from OPEN. The path to a goal is rebuilt when it is
+       found, by replaying the actions from the root: at each step the
+       successor with the recorded action name and gval is taken, so
+       action names must be unique among the successors of a state.'''
+
+    def __init__(self, root, keep_hashes = False):
+        self.root = root
+        self.parents = array('l', [-1])
+        self.actions = array('l', [0])
+        self.gvals = array('d', [root.gval])
+        self.action_ids = {root.action: 0}
+        self.action_names = [root.action]
+        #the hashable states of the nodes are only kept if needed for path checking
+        self.hashes = [root.hashable_state()] if keep_hashes else None
+
+    def add(self, parent, state, hash_state = None):
+        '''Record state as a child of node parent, returning its index'''
+        action_id = self.action_ids.get(state.action)
+        if action_id is None:
+            action_id = self.action_ids[state.action] = len(self.action_names)
+            self.action_names.append(state.action)
+        else:
+            #share one string per action name
+            state.action = self.action_names[action_id]
+        self.parents.append(parent)
+        self.actions.append(action_id)
+        self.gvals.append(state.gval)
+        if self.hashes is not None:
+            self.hashes.append(hash_state)
+        return len(self.parents) - 1
+
+    def has_path_cycle(self, index, hash_state):
+        '''Returns true if hash_state is that of node index or one of its ancestors'''
+        parents = self.parents
+        hashes = self.hashes
+        while index >= 0:
+            if hashes[index] == hash_state:
+                return True
+            index = parents[index]
+        return False
+
+    def rebuild(self, index):
+        '''Returns the state of node index, with its path of parent states'''
+        path = []
+        while index > 0:
+            path.append(index)
+            index = self.parents[index]
+
+        state = self.root
+        for index in reversed(path):
+            action = self.action_names[self.actions[index]]
+            gval = self.gvals[index]
+            for succ in state.successors():
+                if succ.action == action and succ.gval == gval:
+                    state = succ
+                    break
+            else:
+                raise Exception("Could not replay action {} from state {}".format(action, state.hashable_state()))
+        return state
+
 class Open:
     '''Open objects hold the search frontier---the set of unexpanded
        nodes. Depending on the search strategy used we want to extract
@@ -192,8 +338,8 @@ class Open:
        functions to operate as needed by the particular search
        strategy'''
     
-    def __init__(self, search_strategy):
-        if search_strategy == _DEPTH_FIRST:
+    def __init__(self, search_strategy, frontier = _FRONTIER_HEAP, symmetry = False, width = None):
+        if search_strategy == _DEPTH_FIRST or search_strategy == _IDASTAR:
             #use stack for OPEN set (last in---most recent successor added---is first out)
             self.open = []
             self.insert = self.open.append
@@ -203,56 +349,555 @@ class Open:
             self.open = deque()
             self.insert = self.open.append
             self.extract = self.open.popleft
+        elif search_strategy == _BEAM or search_strategy == _BOUNDED_BEST_FIRST:
+            #only the width best nodes (lowest fval, ties broken in favour
+            #of the greatest gval) are kept. Rather than trimming on every
+            #insertion, OPEN grows to 2*width entries and is then cut back
+            #to the best width of them. For beam, self.open is the next
+            #layer and self.layer the (sorted) layer being expanded.
+            sNode.lt_type = _C
+            self.open = []
+            self.width = width
+            self.trimmed = 0
+            counter = count()
+            if search_strategy == _BEAM:
+                self.layer = []
+                self.insert = lambda node: self._bounded_insert((node.fval_function(node), -node.gval, next(counter), node), False)
+                self.extract = self._beam_extract
+                self.empty = lambda: not self.open and not self.layer
+            else:
+                self.insert = lambda node: self._bounded_insert((node.fval_function(node), -node.gval, next(counter), node), True)
+                self.extract = lambda: heapq.heappop(self.open)[3]
+        elif frontier != _FRONTIER_HEAP:
+            #the priority of each node is computed once, on insertion.
+            #Ties are broken in favour of the greatest gval for astar and custom.
+            if search_strategy == _UCS:
+                sNode.lt_type = _G
+                self.priority = lambda node: node.gval
+                self.tiebreak = lambda node: 0
+            elif search_strategy == _BEST_FIRST:
+                sNode.lt_type = _H
+                self.priority = lambda node: node.hval
+                self.tiebreak = lambda node: 0
+            elif search_strategy == _ASTAR:
+                sNode.lt_type = _SUM_HG
+                self.priority = lambda node: node.gval + node.hval
+                self.tiebreak = lambda node: -node.gval
+            elif search_strategy == _CUSTOM:
+                sNode.lt_type = _C
+                self.priority = lambda node: node.fval_function(node)
+                self.tiebreak = lambda node: -node.gval
+            if frontier == _FRONTIER_BUCKET:
+                #use a bucket queue for OPEN. The priority is used to index a dictionary
+                #of buckets; only the distinct priority values are kept in a heap.
+                self.open = dict()
+                self.keys = []
+                self.insert = self._bucket_insert
+                self.extract = self._bucket_extract
+            else:
+                #use an indexed binary heap for OPEN. Entries are lists
+                #[key, tiebreak, counter, node, state] and self.index maps
+                #each state (its hashable_state()) to the position of its
+                #entry, so OPEN never holds two nodes for the same state.
+                #With symmetry reduction states are indexed by the cc_key
+                #of their nodes (see SearchEngine.set_symmetry_reduction).
+                self.open = []
+                self.index = dict()
+                self.symmetry = symmetry
+                self.counter = count()
+                #number of insertions that updated an existing entry in place
+                #with a cheaper path, and number of insertions that would
+                #have left a stale duplicate entry on OPEN (includes the former).
+                self.decrease_keys = 0
+                self.duplicates_avoided = 0
+                self.insert = self._indexed_insert
+                self.extract = self._indexed_extract
+        #For the heap based priority queues we do not rely on sNode.__lt__.
+        #Instead the priority of a node is computed once, when it is
+        #inserted, and the heap stores (key, tiebreak, counter, node)
+        #entries so that heapq only ever compares native tuples. The
+        #counter is unique so comparisons never reach the node itself.
         elif search_strategy == _UCS:
             #use priority queue for OPEN (first out is node with lowest gval)
             self.open = []
-            #set node less than function to compare gvals only
             sNode.lt_type = _G
-            self.insert = lambda node: heapq.heappush(self.open, node)
-            self.extract = lambda: heapq.heappop(self.open)            
+            counter = count()
+            self.insert = lambda node: heapq.heappush(self.open, (node.gval, 0, next(counter), node))
+            self.extract = lambda: heapq.heappop(self.open)[3]
         elif search_strategy == _BEST_FIRST:
             #use priority queue for OPEN (first out is node with lowest hval)
             self.open = []
-            #set node less than function to compare hvals only
             sNode.lt_type = _H
-            self.insert = lambda node: heapq.heappush(self.open, node)
-            self.extract = lambda: heapq.heappop(self.open)
+            counter = count()
+            self.insert = lambda node: heapq.heappush(self.open, (node.hval, 0, next(counter), node))
+            self.extract = lambda: heapq.heappop(self.open)[3]
         elif search_strategy == _ASTAR:
-            #use priority queue for OPEN (first out is node with lowest fval = gval+hval)
+            #use priority queue for OPEN (first out is node with lowest fval = gval+hval,
+            #ties broken in favour of the greatest gval)
             self.open = []
-            #set node less than function to compare sums of hval and gval
             sNode.lt_type = _SUM_HG
-            self.insert = lambda node: heapq.heappush(self.open, node)
-            self.extract = lambda: heapq.heappop(self.open) 
+            counter = count()
+            self.insert = lambda node: heapq.heappush(self.open, (node.gval + node.hval, -node.gval, next(counter), node))
+            self.extract = lambda: heapq.heappop(self.open)[3]
         elif search_strategy == _CUSTOM:
-            #use priority queue for OPEN (first out is node with lowest fval)
+            #use priority queue for OPEN (first out is node with lowest fval,
+            #ties again broken in favour of the greatest gval)
             self.open = []
-            #set node less than function to compare sums of fval    
             sNode.lt_type = _C
-            self.insert = lambda node: heapq.heappush(self.open, node)
-            self.extract = lambda: heapq.heappop(self.open)          
+            counter = count()
+            self.insert = lambda node: heapq.heappush(self.open, (node.fval_function(node), -node.gval, next(counter), node))
+            self.extract = lambda: heapq.heappop(self.open)[3]
+
+    def _bucket_insert(self, node):
+        '''Add node to the bucket for its priority. Each bucket maps a
+           gval to a LIFO list of nodes, so ties on priority are broken
+           in favour of the greatest gval as in sNode.__lt__'''
+        key = self.priority(node)
+        bucket = self.open.get(key)
+        if bucket is None:
+            bucket = self.open[key] = dict()
+            heapq.heappush(self.keys, key)
+        nodes = bucket.get(node.gval)
+        if nodes is None:
+            bucket[node.gval] = [node]
+        else:
+            nodes.append(node)
+
+    def _bucket_extract(self):
+        '''Remove and return a node from the lowest priority bucket'''
+        key = self.keys[0]
+        bucket = self.open[key]
+        if len(bucket) == 1:
+            gval = next(iter(bucket))
+        else:
+            gval = max(bucket)
+        nodes = bucket[gval]
+        node = nodes.pop()
+        if not nodes:
+            del bucket[gval]
+            if not bucket:
+                del self.open[key]
+                heapq.heappop(self.keys)
+        return node
+
+    def _indexed_insert(self, node):
+        '''Add node to OPEN. If OPEN already holds a node for the same
+           state keep only the one with the lower gval (decrease-key)'''
+        hash_state = node.cc_key if self.symmetry else node.state.hashable_state()
+        pos = self.index.get(hash_state)
+        if pos is None:
+            entry = [self.priority(node), self.tiebreak(node), next(self.counter), node, hash_state]
+            self.open.append(entry)
+            self.index[hash_state] = len(self.open) - 1
+            self._sift_up(len(self.open) - 1)
+            return
+        self.duplicates_avoided = self.duplicates_avoided + 1
+        entry = self.open[pos]
+        if node.gval < entry[3].gval:
+            self.decrease_keys = self.decrease_keys + 1
+            entry[0] = self.priority(node)
+            entry[1] = self.tiebreak(node)
+            entry[3] = node
+            #with a custom fval function the key need not decrease
+            self._sift_down(self._sift_up(pos))
+
+    def _indexed_extract(self):
+        '''Remove and return the node with the lowest priority'''
+        heap = self.open
+        last = heap.pop()
+        if heap:
+            entry = heap[0]
+            heap[0] = last
+            self.index[last[4]] = 0
+            self._sift_down(0)
+        else:
+            entry = last
+        del self.index[entry[4]]
+        return entry[3]
+
+    def _sift_up(self, pos):
+        '''Move the entry at pos towards the root until the heap property
+           holds, returning its final position'''
+        heap = self.open
+        index = self.index
+        entry = heap[pos]
+        while pos > 0:
+            parent_pos = (pos - 1) >> 1
+            parent = heap[parent_pos]
+            if entry < parent:
+                heap[pos] = parent
+                index[parent[4]] = pos
+                pos = parent_pos
+            else:
+                break
+        heap[pos] = entry
+        index[entry[4]] = pos
+        return pos
+
+    def _sift_down(self, pos):
+        '''Move the entry at pos towards the leaves until the heap property holds'''
+        heap = self.open
+        index = self.index
+        end = len(heap)
+        entry = heap[pos]
+        child_pos = 2*pos + 1
+        while child_pos < end:
+            right_pos = child_pos + 1
+            if right_pos < end and heap[right_pos] < heap[child_pos]:
+                child_pos = right_pos
+            child = heap[child_pos]
+            if child < entry:
+                heap[pos] = child
+                index[child[4]] = pos
+                pos = child_pos
+                child_pos = 2*pos + 1
+            else:
+                break
+        heap[pos] = entry
+        index[entry[4]] = pos
+
+    def _bounded_insert(self, entry, heap):
+        if heap:
+            heapq.heappush(self.open, entry)
+        else:
+            self.open.append(entry)
+        if len(self.open) >= 2*self.width:
+            self._trim()
+
+    def _trim(self):
+        '''Keep the width best entries of self.open (a sorted list, so also a heap)'''
+        if len(self.open) > self.width:
+            self.trimmed = self.trimmed + len(self.open) - self.width
+            self.open = heapq.nsmallest(self.width, self.open)
+
+    def _beam_extract(self):
+        #the next layer is made of the width best nodes of distinct states,
+        #expanded best node first (so it is kept in reverse order)
+        if not self.layer:
+            states = set()
+            for entry in sorted(self.open):
+                hash_state = entry[3].state.hashable_state()
+                if not hash_state in states:
+                    states.add(hash_state)
+                    self.layer.append(entry)
+                    if len(self.layer) == self.width:
+                        break
+            self.trimmed = self.trimmed + len(self.open) - len(self.layer)
+            self.layer.reverse()
+            self.open = []
+        return self.layer.pop()[3]
+
+    def nodes(self):
+        '''Return a list of the nodes currently on OPEN (in no particular order)'''
+        if isinstance(self.open, dict):
+            return [nd for bucket in self.open.values() for nodes in bucket.values() for nd in nodes]
+        if hasattr(self, 'layer'):
+            return [entry[3] for entry in self.layer + self.open]
+        if self.open and isinstance(self.open[0], (tuple, list)):
+            return [entry[3] for entry in self.open]
+        return list(self.open)
 
     def empty(self): return not self.open
 
     def print_open(self):
         print("{", end="")
-        if len(self.open) == 1: 
-            print("   <S{}:{}:{}, g={}, h={}, f=g+h={}>".format(self.open[0].state.index, self.open[0].state.action, self.open[0].state.hashable_state(), self.open[0].gval, self.open[0].hval, self.open[0].gval+self.open[0].hval), end="")
-        else:
-            for nd in self.open:
-                print("   <S{}:{}:{}, g={}, h={}, f=g+h={}>".format(nd.state.index, nd.state.action, nd.state.hashable_state(), nd.gval, nd.hval, nd.gval+nd.hval), end="")
+        for nd in self.nodes():
+            print("   <S{}:{}:{}, g={}, h={}, f=g+h={}>".format(nd.state.index, nd.state.action, nd.state.hashable_state(), nd.gval, nd.hval, nd.gval+nd.hval), end="")
         print("}")
 
+def _cpu_time():
+    '''User CPU time of this process'''
+    return os.times()[0]
+
+class Deadline:
+    '''A time bound for searching. clock is 'cpu' (user CPU time of this
+       process) or 'wall' (monotonic elapsed time), and timebound is the
+       number of seconds of that clock allowed from now (None for no
+       bound). expired() is called once per expansion; to keep that cheap
+       it only reads the clock every check_every calls. cancel, if given,
+       is a token such as a threading.Event: once it is set (e.g., by
+       another thread) the deadline counts as expired. A Deadline can be
+       passed to SearchEngine.search in place of a timebound, so that
+       several searches share one time budget.'''
+
+    def __init__(self, timebound = None, clock = 'cpu', check_every = 1, cancel = None):
+        if clock == 'wall':
+            self.clock = monotonic
+        else:
+            if clock != 'cpu':
+                print('Unknown clock specified:', clock)
+                print("Must be one of 'cpu' or 'wall', using 'cpu'")
+            self.clock = _cpu_time
+        self.start = self.clock()
+        self.stop = None
+        if timebound is not None:
+            self.stop = self.start + timebound
+        self.check_every = check_every
+        self.countdown = check_every
+        self.cancel = cancel
+
+    def expired(self):
+        '''Amortized check: only reads the clock every check_every calls'''
+        self.countdown -= 1
+        if self.countdown > 0:
+            return False
+        self.countdown = self.check_every
+        return self.expired_now()
+
+    def expired_now(self):
+        '''Check the clock and the cancellation token now'''
+        if self.cancel is not None and self.cancel.is_set():
+            return True
+        return self.stop is not None and self.clock() > self.stop
+
+    def cancelled(self):
+        return self.cancel is not None and self.cancel.is_set()
+
+    def elapsed(self):
+        return self.clock() - self.start
+
+    def remaining(self):
+        '''Seconds left before the deadline (None if there is no bound)'''
+        if self.stop is None:
+            return None
+        return max(0, self.stop - self.clock())
+
+#Files of packed states (see SearchEngine.set_external_memory) are read
+#and written in blocks of this many records
+_RECORD_BLOCK = 4096
+
+def _read_records(path, record_size):
+    '''Generate the fixed size records in a file, in order'''
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(record_size * _RECORD_BLOCK)
+            if not block:
+                return
+            for i in range(0, len(block), record_size):
+                yield block[i:i+record_size]
+
+def _write_records(path, records):
+    '''Write records to a file, returning the number written'''
+    n = 0
+    with open(path, 'wb') as f:
+        block = []
+        for record in records:
+            block.append(record)
+            if len(block) == _RECORD_BLOCK:
+                f.write(b''.join(block))
+                n = n + len(block)
+                block = []
+        f.write(b''.join(block))
+        n = n + len(block)
+    return n
+
+def _new_records(records, old_records):
+    '''Generate the records of the sorted iterable records (once each) that
+       are not in the sorted iterable old_records'''
+    old = next(old_records, None)
+    last = None
+    for record in records:
+        if record == last:
+            continue
+        last = record
+        while old is not None and old < record:
+            old = next(old_records, None)
+        if record != old:
+            yield record
+
+def _hda_owner(hash_state, processes):
+    '''The process of a hash distributed search that owns a state. The hash
+       is mixed (Fibonacci hashing), as the hashes of packed states, e.g.,
+       small integers, may vary little in their low bits.'''
+    return (((hash(hash_state) * 11400714819323198485) & 0xFFFFFFFFFFFFFFFF) >> 40) % processes
+
+def _hda_worker(wid, inboxes, results, initial, goal_fn, heur_fn, costbound, batch_size):
+    '''One process of a hash distributed A* search (see SearchEngine.set_parallel).
+       It runs A* (with full cycle checking) on the states it owns, which
+       arrive in batches of (packed state, gval, hashable state of parent)
+       on inboxes[wid], and sends the successors owned by other processes
+       to their inboxes. It prunes nodes whose f-value is no better than
+       the cheapest solution found by any process (the incumbent). Goals
+       and replies to the coordinator's messages are put on results.'''
+    processes = len(inboxes)
+    inbox = inboxes[wid]
+    packed = initial.pack_state() is not None
+    open = []
+    counter = count()
+    #the cheapest g-value of, and the parent on that path of, each state reached
+    best_g = dict()
+    parents = dict()
+    outboxes = [[] for _ in range(processes)]
+    incumbent = float('inf')
+    counts = {'sent': 0, 'received': 0, 'nodes': 0, 'expanded': 0, 'generated': 0, 'cycle_check_pruned': 0, 'cost_bound_pruned': 0}
+
+    def add(state, parent_hash):
+        hash_state = state.hashable_state()
+        if hash_state in best_g and best_g[hash_state] <= state.gval:
+            counts['cycle_check_pruned'] += 1
+            return
+        hval = heur_fn(state)
+        if state.gval + hval >= incumbent or (costbound is not None and (state.gval > costbound[0] or
+                                              hval > costbound[1] or
+                                              state.gval + hval > costbound[2])):
+            counts['cost_bound_pruned'] += 1
+            return
+        best_g[hash_state] = state.gval
+        parents[hash_state] = parent_hash
+        counts['nodes'] += 1
+        heapq.heappush(open, (state.gval + hval, -state.gval, next(counter), state))
+
+    def flush():
+        for owner, batch in enumerate(outboxes):
+            if batch:
+                inboxes[owner].put(('states', batch))
+                counts['sent'] += len(batch)
+                outboxes[owner] = []
+
+    while True:
+        idle = not open or open[0][0] >= incumbent
+        try:
+            message = inbox.get(timeout = 0.05) if idle else inbox.get_nowait()
+        except queue.Empty:
+            message = None
+        while message is not None:
+            if message[0] == 'states':
+                for data, gval, parent_hash in message[1]:
+                    state = initial.unpack_state(data) if packed else data
+                    state.gval = gval
+                    add(state, parent_hash)
+                counts['received'] += len(message[1])
+            elif message[0] == 'incumbent':
+                incumbent = min(incumbent, message[1])
+            elif message[0] == 'probe':
+                idle = not open or open[0][0] >= incumbent
+                results.put(('status', wid, message[1], idle, counts['sent'], counts['received']))
+            elif message[0] == 'parent':
+                results.put(('parent', message[1], parents[message[1]]))
+            elif message[0] == 'stop':
+                results.put(('stats', wid, counts))
+                #do not wait to deliver anything left for processes that have stopped
+                for q in inboxes:
+                    q.cancel_join_thread()
+                return
+            try:
+                message = inbox.get_nowait()
+            except queue.Empty:
+                message = None
+
+        for _ in range(batch_size):
+            if not open or open[0][0] >= incumbent:
+                break
+            state = heapq.heappop(open)[3]
+            hash_state = state.hashable_state()
+            if best_g[hash_state] < state.gval:
+                continue
+            if goal_fn(state):
+                if state.gval < incumbent:
+                    incumbent = state.gval
+                    results.put(('goal', state.gval, hash_state))
+                continue
+            counts['expanded'] += 1
+            for succ in state.successors():
+                counts['generated'] += 1
+                owner = _hda_owner(succ.hashable_state(), processes)
+                if owner == wid:
+                    succ.parent = None
+                    add(succ, hash_state)
+                else:
+                    if packed:
+                        data = succ.pack_state()
+                    else:
+                        data = copy.copy(succ)
+                        data.parent = None
+                    outboxes[owner].append((data, succ.gval, hash_state))
+        flush()
+
+class SearchStats:
+    '''Statistics of one call to SearchEngine.search (see search's
+       return_stats). search_time is CPU time and wall_time is elapsed
+       time, both in seconds. The heuristic and successors() call counts
+       and times are only collected when profiling is on (see
+       SearchEngine.set_profiling).'''
+
+    def __init__(self):
+        self.strategy = None
+        self.solved = False
+        self.cost = None
+        self.nodes_expanded = 0
+        self.states_generated = 0
+        self.cycle_check_pruned = 0
+        self.cost_bound_pruned = 0
+        self.dead_state_pruned = 0
+        self.open_decrease_keys = 0
+        self.open_duplicates_avoided = 0
+        self.frontier_trimmed = 0
+        self.search_time = 0
+        self.wall_time = 0
+        self.heur_calls = 0
+        self.heur_time = 0
+        self.successors_calls = 0
+        self.successors_time = 0
+        self.heur_cache_hits = 0
+        self.heur_cache_misses = 0
+
+    def as_dict(self):
+        '''Return the statistics as a dictionary (e.g., to write as JSON)'''
+        return dict(self.__dict__)
+
+    def __str__(self):
+        if self.solved:
+            rval = "Solution Found with cost of {} in search time of {} sec".format(self.cost, self.search_time)
+        else:
+            rval = "Search Failed! No solution found."
+        rval = rval + "\nNodes expanded = {}, states generated = {}, states cycle check pruned = {}, states cost bound pruned = {}".format(
+            self.nodes_expanded, self.states_generated, self.cycle_check_pruned, self.cost_bound_pruned)
+        if self.heur_calls or self.successors_calls:
+            rval = rval + "\nHeuristic calls = {} ({} sec), successor calls = {} ({} sec)".format(
+                self.heur_calls, self.heur_time, self.successors_calls, self.successors_time)
+        if self.dead_state_pruned:
+            rval = rval + "\nDead states pruned = {}".format(self.dead_state_pruned)
+        if self.frontier_trimmed:
+            rval = rval + "\nNodes trimmed from the frontier = {}".format(self.frontier_trimmed)
+        if self.heur_cache_hits or self.heur_cache_misses:
+            rval = rval + "\nHeuristic cache hits = {}, misses = {}".format(self.heur_cache_hits, self.heur_cache_misses)
+        return rval
+
 class SearchEngine:
-    def __init__(self, strategy = 'depth_first', cc_level = 'default'):
+    def __init__(self, strategy = 'depth_first', cc_level = 'default', frontier = 'heap'):
         self.set_strategy(strategy, cc_level)
+        self.frontier = _FRONTIER_HEAP
+        self.set_frontier(frontier)
+        self.bidirectional = False
+        self.node_storage = 'states'
+        self.symmetry = False
         self.trace = 0
+        self.profile = False
+        self.stats = None
+        self.heur_fn = None
+        self.dead_fn = None
+        self.set_heuristic_cache(0)
+        self.set_timing()
+        self.set_callbacks()
+        self.set_external_memory(False)
+        self.set_beam_width()
+        self.set_parallel(1)
 
     def initStats(self):
         sNode.n = 0
         StateSpace.n = 1    #initial state already generated on call so search
         self.cycle_check_pruned = 0
         self.cost_bound_pruned = 0
+        self.dead_state_pruned = 0
+        self.open_decrease_keys = 0
+        self.open_duplicates_avoided = 0
+        self.frontier_trimmed = 0
+        self.heur_calls = 0
+        self.heur_time = 0
+        self.successors_calls = 0
+        self.successors_time = 0
+        self.heur_cache_hits = 0
+        self.heur_cache_misses = 0
 
     def trace_on(self, level = 1):
         '''For debugging, set tracking level 1 or 2'''
@@ -262,17 +907,148 @@ class SearchEngine:
         '''Turn off tracing'''
         self.trace = 0
 
+    def set_timing(self, clock = 'cpu', check_every = 1, cancel = None):
+        '''Select how a timebound given to search is measured: clock is
+           'cpu' (user CPU time, the default) or 'wall' (monotonic elapsed
+           time, e.g., to meet a response time), and the clock is read
+           every check_every expansions. Setting the cancel token (e.g., a
+           threading.Event) stops the search at its next check. See
+           Deadline.'''
+        self.clock = clock
+        self.check_every = check_every
+        self.cancel = cancel
+
+    def _make_deadline(self, timebound):
+        '''Return timebound as a Deadline (it may already be one)'''
+        if isinstance(timebound, Deadline):
+            return timebound
+        return Deadline(timebound or None, self.clock, self.check_every, self.cancel)
+
+    def _time_is_up(self, now = False):
+        '''Check the deadline of the current search, reporting why it stops.
+           now reads the clock on every call (for loops that may block),
+           rather than every check_every calls.'''
+        if not (self.deadline.expired_now() if now else self.deadline.expired()):
+            return False
+        if self.deadline.cancelled():
+            print("TRACE: Search has been cancelled.")
+        else:
+            print("TRACE: Search has exceeeded the time bound provided.")
+        return True
+
+    def set_profiling(self, on = True):
+        '''Turn timing of the heuristic function and of successors() on
+           or off. The totals are reported in the search statistics.'''
+        self.profile = on
+
+    def set_callbacks(self, on_expand = None, on_generate = None, on_prune = None):
+        '''Register functions to be called during search (None for no
+           call). on_expand(node) is called with each search node about
+           to be expanded, on_generate(state) with each successor state
+           generated and on_prune(state, reason) with each successor
+           pruned, where reason is 'cycle_check' or 'cost_bound'. The
+           callbacks are made by the OPEN based searches and idastar
+           (not by bidirectional search).'''
+        self.on_expand = on_expand
+        self.on_generate = on_generate
+        self.on_prune = on_prune
+
+    def set_heuristic_cache(self, size = 100000):
+        '''Cache the heuristic values of up to size states (0 for no
+           caching), keyed on hashable_state(). When the cache is full the
+           least recently used value is dropped. The cache is kept across
+           calls to init_search made with the same heur_fn and the same
+           initState object, so e.g. the repeated searches of anytime search
+           reuse each other's values; it is cleared for any other problem,
+           as hashable_state() need not tell apart states of different
+           problems (e.g., LunarLockout boards of different sizes).
+           Only worthwhile when the heuristic is costly to compute relative
+           to hashable_state().'''
+        self.heur_cache_size = size
+        self.heur_cache = OrderedDict()
+        self.heur_cache_problem = None
+
+    def _cached_heur_fn(self, heur_fn):
+        '''Return heur_fn wrapped to look up and store its values in the heuristic cache'''
+        cache = self.heur_cache
+        size = self.heur_cache_size
+        def cached_heur_fn(state):
+            key = state.hashable_state()
+            hval = cache.get(key)
+            if hval is not None:
+                cache.move_to_end(key)
+                self.heur_cache_hits += 1
+                return hval
+            self.heur_cache_misses += 1
+            hval = heur_fn(state)
+            cache[key] = hval
+            if len(cache) > size:
+                cache.popitem(last = False)
+            return hval
+        return cached_heur_fn
+
+    def _timed_heur_fn(self, heur_fn):
+        '''Return heur_fn wrapped to count its calls and the time spent in it'''
+        def timed_heur_fn(state):
+            start = perf_counter()
+            hval = heur_fn(state)
+            self.heur_time += perf_counter() - start
+            self.heur_calls += 1
+            return hval
+        return timed_heur_fn
+
+    def _timed_heur_fn_batch(self, heur_fn_batch):
+        '''Return heur_fn_batch wrapped to count the states it evaluates and the time spent in it'''
+        def timed_heur_fn_batch(states):
+            start = perf_counter()
+            hvals = heur_fn_batch(states)
+            self.heur_time += perf_counter() - start
+            self.heur_calls += len(states)
+            return hvals
+        return timed_heur_fn_batch
+
+    def _successors(self, state):
+        '''Return state.successors(), timing the call when profiling'''
+        if not self.profile:
+            return state.successors()
+        start = perf_counter()
+        successors = state.successors()
+        self.successors_time += perf_counter() - start
+        self.successors_calls += 1
+        return successors
+
+    def _live_successors(self, state):
+        '''Return the successors of state, leaving out those that dead_fn
+           (see init_search) reports to be dead states'''
+        successors = self._successors(state)
+        dead_fn = self.dead_fn
+        if dead_fn is None:
+            return successors
+        live = []
+        for succ in successors:
+            if not dead_fn(succ):
+                live.append(succ)
+                continue
+            self.dead_state_pruned = self.dead_state_pruned + 1
+            if self.on_generate: self.on_generate(succ)
+            if self.on_prune: self.on_prune(succ, 'dead_state')
+            if self.trace > 1:
+                print(" TRACE: Successor State pruned as a dead state")
+        return live
+
     def set_strategy(self, s, cc = 'default'):
-        if not s in ['depth_first', 'breadth_first', 'ucs', 'best_first', 'astar', 'custom']:
+        if not s in ['depth_first', 'breadth_first', 'ucs', 'best_first', 'astar', 'custom', 'idastar', 'beam', 'bounded_best_first']:
             print('Unknown search strategy specified:', s)
-            print("Must be one of 'depth_first', 'ucs', 'breadth_first', 'best_first', 'custom' or 'astar'")
+            print("Must be one of 'depth_first', 'ucs', 'breadth_first', 'best_first', 'custom', 'astar', 'idastar', 'beam' or 'bounded_best_first'")
         elif not cc in ['default', 'none', 'path', 'full']:
             print('Unknown cycle check level', cc)
             print( "Must be one of ['default', 'none', 'path', 'full']")
 
         else:
             if cc == 'default' :
-                if s == 'depth_first' :
+                #beam and bounded_best_first would otherwise keep every
+                #state reached in the cycle check dictionary
+                if s == 'depth_first' or s == 'idastar' or s == 'beam' or s == 'bounded_best_first':
                     self.cycle_check = _CC_PATH
                 else:
                     self.cycle_check = _CC_FULL
@@ -280,12 +1056,130 @@ class SearchEngine:
             elif cc == 'path': self.cycle_check = _CC_PATH
             elif cc == 'full': self.cycle_check = _CC_FULL
 
+            #idastar only stores the current path, so it can at most do path checking
+            if s == 'idastar' and self.cycle_check == _CC_FULL:
+                self.cycle_check = _CC_PATH
+
             if   s == 'depth_first'  : self.strategy = _DEPTH_FIRST
             elif s == 'breadth_first': self.strategy = _BREADTH_FIRST
             elif s == 'ucs' : self.strategy = _UCS               
             elif s == 'best_first'   : self.strategy = _BEST_FIRST
             elif s == 'astar'        : self.strategy = _ASTAR       
             elif s == 'custom' : self.strategy = _CUSTOM             
+            elif s == 'idastar'      : self.strategy = _IDASTAR
+            elif s == 'beam'         : self.strategy = _BEAM
+            elif s == 'bounded_best_first': self.strategy = _BOUNDED_BEST_FIRST
+
+    def set_beam_width(self, width = 1000):
+        '''Set the number of nodes kept by the beam strategy in each layer
+           (the width best successors of a layer, by fval_function, are
+           expanded in the next) and by the bounded_best_first strategy
+           on OPEN overall (a custom search that drops the worst nodes,
+           by fval_function, to keep OPEN that size). Neither is complete
+           or optimal, but they search in bounded memory; with the default
+           fval_function they order nodes by hval.'''
+        self.beam_width = width
+
+    def set_frontier(self, f):
+        '''Select the OPEN implementation used by the priority queue strategies
+           (ucs, best_first, astar and custom). 'heap' is a binary heap.
+           'bucket' is a bucket queue, suited to problems whose priorities
+           take few distinct values (e.g., unit cost domains), where
+           insertion and extraction take constant time. 'indexed' is a
+           binary heap holding at most one node per state: finding a
+           cheaper path to a state already on OPEN updates its entry in
+           place instead of adding a duplicate. It is only used with full
+           cycle checking (other cycle check levels fall back to 'heap').'''
+        if not f in ['heap', 'bucket', 'indexed']:
+            print('Unknown frontier specified:', f)
+            print("Must be one of 'heap', 'bucket' or 'indexed'")
+        elif f == 'heap': self.frontier = _FRONTIER_HEAP
+        elif f == 'bucket': self.frontier = _FRONTIER_BUCKET
+        elif f == 'indexed': self.frontier = _FRONTIER_INDEXED
+
+    def set_symmetry_reduction(self, on = True):
+        '''Turn symmetry reduction on or off. When on, full cycle checking
+           in the OPEN based searches stores states by canonical_state(),
+           so a state symmetric to one already reached at no greater cost
+           is pruned. Paths are made of the states actually generated, so
+           solutions remain in the original orientation.'''
+        self.symmetry = on
+
+    def set_node_storage(self, s):
+        '''Select how the OPEN based searches store the search tree.
+           'states' links each state to its parent state, so every state
+           generated stays in memory until the search ends. 'arena' keeps
+           the tree in a NodeArena instead and frees states once they are
+           expanded, rebuilding the path to a goal when one is found (and
+           doing path checking on the arena). idastar and bidirectional
+           search always use 'states'.'''
+        if not s in ['states', 'arena']:
+            print('Unknown node storage specified:', s)
+            print("Must be one of 'states' or 'arena'")
+        else:
+            self.node_storage = s
+
+    def set_external_memory(self, on = True, directory = None, buffer_states = 1000000, locality = None):
+        '''Turn external memory breadth first search on or off. When on,
+           breadth_first searches keep each layer (the states first reached
+           with the same number of actions) in a file of sorted packed
+           states (see StateSpace.pack_state) in a temporary directory
+           made in directory (None for the system default), rather than
+           keeping OPEN and the cycle check dictionary in memory. Up to
+           buffer_states successors are held in memory at a time; the
+           sorted runs written out are merged against the earlier layers
+           to remove duplicates. locality, if given, is the number of
+           earlier layers a successor can be a duplicate in (e.g., 2 if
+           every action can be undone); by default all are merged against.
+           costbound only bounds the number of actions, and the search
+           is by number of actions, so the solution is optimal for unit
+           action costs. The layer sizes of the last search are kept in
+           external_layer_sizes.'''
+        self.external = on
+        self.external_directory = directory
+        self.external_buffer_states = buffer_states
+        self.external_locality = locality
+        self.external_layer_sizes = []
+
+    def _external_bfs(self):
+        return self.external and self.strategy == _BREADTH_FIRST
+
+    def set_parallel(self, processes = None, batch_size = 64):
+        '''Set the number of processes astar searches with (None for one
+           per CPU, 1 for the usual search in this process). With more
+           than one, the search is a hash distributed A* (HDA*): each state
+           is owned by one worker process, chosen by its hashable_state(),
+           which keeps its own OPEN and cycle check dictionary, and
+           successors are sent to their owners in batches of up to
+           batch_size. The search stops once a solution has been found and
+           no process holds a node that could lead to a cheaper one (nor
+           is any node on its way to a process), so with an admissible
+           heuristic the solution is optimal. If the timebound expires
+           first, the cheapest solution found so far (if any) is returned.
+           The timebound is measured on the wall clock whatever the clock of
+           set_timing, as this process mostly waits for the workers.
+           Search states are sent between processes packed (see
+           StateSpace.pack_state) if possible, else pickled. This needs
+           the fork start method of multiprocessing (so that goal_fn and
+           heur_fn need not be picklable); without it the search runs in
+           this process. HDA* always does full cycle checking, and does not
+           make callbacks or use the heuristic cache.'''
+        self.processes = processes or os.cpu_count() or 1
+        self.parallel_batch_size = batch_size
+
+    def _parallel_astar(self):
+        return self.processes > 1 and self.strategy == _ASTAR
+
+    def set_bidirectional(self, on = True):
+        '''Turn bidirectional search on or off. When on, and init_search is
+           given a goal_state whose predecessors() are provided, breadth_first
+           searches layer by layer from both ends and astar runs a front-to-end
+           bidirectional A* (forward with heur_fn, backward with the
+           backward_heur_fn given to init_search), both stopping once the
+           cheapest path through a state reached from both ends is known.
+           Otherwise the search falls back to the normal unidirectional one.
+           Bidirectional search always does full cycle checking.'''
+        self.bidirectional = on
 
     def get_strategy(self):
         if   self.strategy == _DEPTH_FIRST    : rval = 'depth_first'
@@ -294,6 +1188,9 @@ class SearchEngine:
         elif self.strategy == _UCS          : rval = 'ucs' 
         elif self.strategy == _ASTAR          : rval = 'astar'      
         elif self.strategy == _CUSTOM          : rval = 'custom'   
+        elif self.strategy == _IDASTAR        : rval = 'idastar'
+        elif self.strategy == _BEAM           : rval = 'beam'
+        elif self.strategy == _BOUNDED_BEST_FIRST: rval = 'bounded_best_first'
   
         rval = rval + ' with '
 
@@ -303,7 +1200,8 @@ class SearchEngine:
 
         return rval
 
-    def init_search(self, initState, goal_fn, heur_fn=_zero_hfn, fval_function=_fval_function):
+    def init_search(self, initState, goal_fn, heur_fn=_zero_hfn, fval_function=_fval_function,
+                    goal_state=None, backward_heur_fn=_zero_hfn, heur_fn_batch=None, dead_fn=None):
         """
         Get ready to search. Call search on this object to run the search.
 
@@ -311,6 +1209,14 @@ class SearchEngine:
         @param goal_fn: the goal function for the puzzle
         @param heur_fn: the heuristic function to use (only relevant for search strategies that use heuristics)
         @param fval_fn: the f-value function (only relevant for custom search strategy)
+        @param goal_state: the goal state (only relevant for bidirectional search, see set_bidirectional)
+        @param backward_heur_fn: estimate of the cost from a state back to initState (only relevant for bidirectional astar)
+        @param heur_fn_batch: optionally, the same heuristic evaluated on a list of states at once, returning a sequence
+                              of their values. When given, the OPEN based searches use it for all the successors
+                              of an expansion (bypassing the heuristic cache); heur_fn is used for single states.
+        @param dead_fn: optionally, a function that returns True for states from which no goal can be reached. The
+                        OPEN based searches, idastar and external memory search prune such successors before
+                        evaluating their heuristic.
         """
         #Perform full cycle checking as follows
         #a. check state before inserting into OPEN. If we had already reached
@@ -330,53 +1236,163 @@ class SearchEngine:
             print("   TRACE: Initial State:", end="")
             initState.print_state()
         #END 
-        self.open = Open(self.strategy)
+        if heur_fn is not self.heur_fn or initState is not self.heur_cache_problem:
+            #cached values are only valid for the heuristic and the problem they were computed for
+            self.heur_cache.clear()
+            self.heur_cache_problem = initState
+        frontier = self.frontier
+        if frontier == _FRONTIER_INDEXED and self.cycle_check != _CC_FULL:
+            frontier = _FRONTIER_HEAP
+        self.open = Open(self.strategy, frontier, self.symmetry and self.cycle_check == _CC_FULL, self.beam_width)
 
         node = sNode(initState, heur_fn(initState), fval_function)      
 
         #the cycle check dictionary stores the cheapest path (g-val) found
-        #so far to a state. 
+        #so far to a state. With symmetry reduction states are stored by
+        #their canonical state, which is kept in the node as cc_key
         if self.cycle_check == _CC_FULL:
             self.cc_dictionary = dict() 
-            self.cc_dictionary[initState.hashable_state()] = initState.gval
+            if self.symmetry:
+                node.cc_key = initState.canonical_state()
+                self.cc_dictionary[node.cc_key] = initState.gval
+            else:
+                self.cc_dictionary[initState.hashable_state()] = initState.gval
         
         self.open.insert(node)
         self.fval_function = fval_function
         self.goal_fn = goal_fn
         self.heur_fn = heur_fn
-
-    def search(self, timebound=None, costbound=None):
+        self.heur_fn_batch = heur_fn_batch
+        self.dead_fn = dead_fn
+
+        #bidirectional search needs a goal state to search backwards from
+        self.goal_state = None
+        self.backward_heur_fn = backward_heur_fn
+        if self.bidirectional and (self.strategy == _BREADTH_FIRST or self.strategy == _ASTAR):
+            if goal_state is not None and goal_state.predecessors() is not None:
+                self.goal_state = goal_state
+            elif self.trace:
+                print("   TRACE: No goal state predecessors, using unidirectional search")
+
+        #the arena, if used, holds the search tree; the current path of a
+        #depth first search is kept as a list of (node, hashable state)
+        #and a set of the hashable states on it
+        self.arena = None
+        if (self.node_storage == 'arena' and self.strategy != _IDASTAR and self.goal_state is None and
+            not self._external_bfs() and not self._parallel_astar()):
+            keep_hashes = self.cycle_check == _CC_PATH and self.strategy != _DEPTH_FIRST
+            self.arena = NodeArena(initState, keep_hashes)
+            initState.arena_index = 0
+            self.arena_path = []
+            self.arena_path_set = set()
+
+    def search(self, timebound=None, costbound=None, return_stats=False):
         """
         Start searching, using the parameters set by init_search.
 
-        @param timebound: the maximum amount of time, in seconds, to spend on this search.
+        @param timebound: the maximum amount of time, in seconds, to spend on this search (see set_timing), or a Deadline.
         @param costbound: the cost bound 3-tuple for pruning, as specified in the assignment.
+        @param return_stats: if True return a (goal state, SearchStats) pair instead of just the goal state.
         """
 
         goal_node = []
 
         ###NOW do the search and return the result
         self.search_start_time = os.times()[0]
-        self.search_stop_time = None
-        if timebound:
-            self.search_stop_time = self.search_start_time + timebound
-        goal_node = self._searchOpen(self.goal_fn, self.heur_fn, self.fval_function, costbound)
+        search_start_wall = os.times()[4]
+        self.deadline = self._make_deadline(timebound)
+        heur_fn = self.heur_fn
+        backward_heur_fn = self.backward_heur_fn
+        if self.profile:
+            heur_fn = self._timed_heur_fn(heur_fn)
+            backward_heur_fn = self._timed_heur_fn(backward_heur_fn)
+        if self.heur_cache_size:
+            heur_fn = self._cached_heur_fn(heur_fn)
+        heur_fn_batch = self.heur_fn_batch
+        if heur_fn_batch is not None and self.profile:
+            heur_fn_batch = self._timed_heur_fn_batch(heur_fn_batch)
+        if self.strategy == _IDASTAR:
+            goal_node = self._searchIDA(self.goal_fn, heur_fn, costbound)
+        elif self._external_bfs():
+            goal_node = self._searchExternalBFS(self.goal_fn, costbound)
+        elif self._parallel_astar() and self.goal_state is None:
+            goal_node = self._searchHDA(self.goal_fn, self.heur_fn, costbound)
+        elif self.goal_state is not None and self.strategy == _BREADTH_FIRST:
+            goal_node = self._searchBidirectionalBFS(costbound)
+        elif self.goal_state is not None:
+            goal_node = self._searchBidirectionalAstar(heur_fn, backward_heur_fn, costbound)
+        else:
+            goal_node = self._searchOpen(self.goal_fn, heur_fn, self.fval_function, costbound, heur_fn_batch)
+        if hasattr(self.open, 'index'):
+            self.open_decrease_keys = self.open.decrease_keys
+            self.open_duplicates_avoided = self.open.duplicates_avoided
+        if hasattr(self.open, 'trimmed'):
+            self.frontier_trimmed = self.open.trimmed
 
         if goal_node:
             total_search_time = os.times()[0] - self.search_start_time
             #print("Solution Found with cost of {} in search time of {} sec".format(goal_node.gval, total_search_time))
             #print("Nodes expanded = {}, states generated = {}, states cycle check pruned = {}, states cost bound pruned = {}".format(
             #    sNode.n, StateSpace.n, self.cycle_check_pruned, self.cost_bound_pruned))
-            return goal_node.state
+            result = goal_node.state
+            if self.arena is not None:
+                result = self.arena.rebuild(result.arena_index)
         else:
             #exited the while without finding goal---search failed
             total_search_time = os.times()[0] - self.search_start_time            
             #print("Search Failed! No solution found.")
             #print("Nodes expanded = {}, states generated = {}, states cycle check pruned = {}, states cost bound pruned = {}".format(
             #    sNode.n, StateSpace.n, self.cycle_check_pruned, self.cost_bound_pruned))
-            return False
-
-    def _searchOpen(self, goal_fn, heur_fn, fval_function, costbound):
+            result = False
+
+        self.stats = self._collect_stats(result, total_search_time, os.times()[4] - search_start_wall)
+        if return_stats:
+            return result, self.stats
+        return result
+
+    def _collect_stats(self, goal_state, search_time, wall_time):
+        '''Return a SearchStats object for the search just completed'''
+        stats = SearchStats()
+        stats.strategy = self.get_strategy()
+        stats.solved = bool(goal_state)
+        if goal_state:
+            stats.cost = goal_state.gval
+        stats.nodes_expanded = sNode.n
+        stats.states_generated = StateSpace.n
+        stats.cycle_check_pruned = self.cycle_check_pruned
+        stats.cost_bound_pruned = self.cost_bound_pruned
+        stats.dead_state_pruned = self.dead_state_pruned
+        stats.open_decrease_keys = self.open_decrease_keys
+        stats.open_duplicates_avoided = self.open_duplicates_avoided
+        stats.frontier_trimmed = self.frontier_trimmed
+        stats.search_time = search_time
+        stats.wall_time = wall_time
+        stats.heur_calls = self.heur_calls
+        stats.heur_time = self.heur_time
+        stats.successors_calls = self.successors_calls
+        stats.successors_time = self.successors_time
+        stats.heur_cache_hits = self.heur_cache_hits
+        stats.heur_cache_misses = self.heur_cache_misses
+        return stats
+
+    def _arena_enter(self, node):
+        '''Make node the last node of the current depth first path'''
+        path = self.arena_path
+        index = node.state.arena_index
+        parent = self.arena.parents[index]
+        while path and path[-1][0] != parent:
+            self.arena_path_set.discard(path.pop()[1])
+        hash_state = node.state.hashable_state()
+        path.append((index, hash_state))
+        self.arena_path_set.add(hash_state)
+
+    def _arena_path_cycle(self, node, hash_state):
+        '''Returns true if hash_state is on the path to node (stored in the arena)'''
+        if self.strategy == _DEPTH_FIRST:
+            return hash_state in self.arena_path_set
+        return self.arena.has_path_cycle(node.state.arena_index, hash_state)
+
+    def _searchOpen(self, goal_fn, heur_fn, fval_function, costbound, heur_fn_batch = None):
         """
         Search, starting from self.open.
 
@@ -384,6 +1400,7 @@ class SearchEngine:
         @param heur_fn: the heuristic function.
         @param fval_function: the f-value function (only relevant when using a custom search strategy).
         @param costbound: the cost bound 3-tuple, as described in the assignment.
+        @param heur_fn_batch: the batch heuristic function, if any (see init_search).
         """
 
         #BEGIN TRACING
@@ -392,6 +1409,10 @@ class SearchEngine:
             if self.cycle_check == _CC_FULL:
                 print("   TRACE: Initial CC_Dict:", self.cc_dictionary)
         #END TRACING
+        on_expand, on_generate, on_prune = self.on_expand, self.on_generate, self.on_prune
+        arena = self.arena
+        arena_dfs_path = arena is not None and self.cycle_check == _CC_PATH and self.strategy == _DEPTH_FIRST
+        symmetry = self.symmetry and self.cycle_check == _CC_FULL
         while not self.open.empty():
             node = self.open.extract()
 
@@ -407,10 +1428,8 @@ class SearchEngine:
               #node at front of OPEN is a goal...search is completed.
               return node
 
-            if self.search_stop_time: #timebound check
-              if os.times()[0] > self.search_stop_time:                
-                #exceeded time bound, must terminate search
-                print("TRACE: Search has exceeeded the time bound provided.")
+            if self._time_is_up(): #timebound check
+                #exceeded time bound (or cancelled), must terminate search
                 return False
 
              #All states reached by a search node on OPEN have already
@@ -423,13 +1442,15 @@ class SearchEngine:
             #BEGIN TRACING
             if self.trace:
                 if self.cycle_check == _CC_FULL: print("   TRACE: CC_dict gval={}, node.gval={}".format(
-                    self.cc_dictionary[node.state.hashable_state()], node.gval))
+                    self.cc_dictionary[node.cc_key if symmetry else node.state.hashable_state()], node.gval))
             #END TRACING
 
-            if self.cycle_check == _CC_FULL and self.cc_dictionary[node.state.hashable_state()] < node.gval:
+            if self.cycle_check == _CC_FULL and self.cc_dictionary[node.cc_key if symmetry else node.state.hashable_state()] < node.gval:
                 continue
 
-            successors = node.state.successors()
+            if on_expand: on_expand(node)
+            if arena_dfs_path: self._arena_enter(node)
+            successors = self._live_successors(node.state)
 
             #BEGIN TRACING
             if self.trace:
@@ -440,12 +1461,18 @@ class SearchEngine:
                 print("}")
             #END TRACING
 
-            for succ in successors:
+            #with a batch heuristic all the successors are evaluated at once,
+            #including any that are then pruned by cycle checking
+            hvals = heur_fn_batch(successors) if heur_fn_batch is not None and successors else None
+
+            for i, succ in enumerate(successors):
+                if on_generate: on_generate(succ)
                 hash_state = succ.hashable_state()
+                cc_key = succ.canonical_state() if symmetry else hash_state
                 if self.trace > 1: 
-                  if self.cycle_check == _CC_FULL and hash_state in self.cc_dictionary:
+                  if self.cycle_check == _CC_FULL and cc_key in self.cc_dictionary:
                       print("   TRACE: Already in CC_dict, CC_dict gval={}, successor state gval={}".format(
-                        self.cc_dictionary[hash_state], succ.gval))   
+                        self.cc_dictionary[cc_key], succ.gval))   
 
                 #BEGIN TRACING
                 if self.trace > 1:
@@ -453,24 +1480,25 @@ class SearchEngine:
                     succ.print_state()
                     print("   TRACE: Heuristic Value:", heur_fn(succ))
 
-                    if self.cycle_check == _CC_FULL and hash_state in self.cc_dictionary:
+                    if self.cycle_check == _CC_FULL and cc_key in self.cc_dictionary:
                         print("   TRACE: Already in CC_dict, CC_dict gval={}, successor state gval={}".format(
-                            self.cc_dictionary[hash_state], succ.gval))
+                            self.cc_dictionary[cc_key], succ.gval))
 
                     if self.cycle_check == _CC_PATH and succ.has_path_cycle():
                         print("   TRACE: On cyclic path")
                 #END TRACING
 
                 prune_succ = (self.cycle_check == _CC_FULL and
-                              hash_state in self.cc_dictionary and
-                              succ.gval > self.cc_dictionary[hash_state]
+                              cc_key in self.cc_dictionary and
+                              succ.gval > self.cc_dictionary[cc_key]
                              ) or (
                               self.cycle_check == _CC_PATH and
-                              succ.has_path_cycle()
+                              (self._arena_path_cycle(node, hash_state) if arena is not None else succ.has_path_cycle())
                              )
 
                 if prune_succ :
                     self.cycle_check_pruned = self.cycle_check_pruned + 1
+                    if on_prune: on_prune(succ, 'cycle_check')
                     #BEGIN TRACING
                     if self.trace > 1:
                         print(" TRACE: Successor State pruned by cycle checking")
@@ -478,18 +1506,24 @@ class SearchEngine:
                     #END TRACING
                     continue
 
-                succ_hval = heur_fn(succ)
+                succ_hval = heur_fn(succ) if hvals is None else hvals[i]
                 if costbound is not None and (succ.gval > costbound[0] or
                                               succ_hval > costbound[1] or
                                               succ.gval + succ_hval > costbound[2]) : 
                     self.cost_bound_pruned = self.cost_bound_pruned + 1
+                    if on_prune: on_prune(succ, 'cost_bound')
                     if self.trace > 1:
                       print(" TRACE: Successor State pruned, over current cost bound of {}", costbound)
                       print("\n") 
                     continue                    
 
                 #passed all cycle checks and costbound checks ...add to open
-                self.open.insert(sNode(succ, succ_hval, node.fval_function))
+                if arena is not None:
+                    succ.arena_index = arena.add(node.state.arena_index, succ, hash_state)
+                    succ.parent = None
+                succ_node = sNode(succ, succ_hval, node.fval_function)
+                if symmetry: succ_node.cc_key = cc_key
+                self.open.insert(succ_node)
 
                 #BEGIN TRACING
                 if self.trace > 1:
@@ -499,8 +1533,647 @@ class SearchEngine:
 
                 #record cost of this path in dictionary.
                 if self.cycle_check == _CC_FULL:
-                    self.cc_dictionary[hash_state] = succ.gval
+                    self.cc_dictionary[cc_key] = succ.gval
 
         #end of while--OPEN is empty and no solution
         return False
             
+
+    def _searchExternalBFS(self, goal_fn, costbound):
+        """
+        External memory breadth first search from the node on self.open
+        (see set_external_memory). A layer is expanded by streaming its
+        file; the packed successors are buffered, sorted and written out
+        as runs, and the runs are merged, dropping duplicates and the
+        states of earlier layers, into the file of the next layer. Falls
+        back to breadth first search in memory if states cannot be packed.
+
+        @param goal_fn: the goal function.
+        @param costbound: the cost bound 3-tuple; only its first element (here a number of actions) is used.
+        """
+        initial = self.open.extract().state
+        packed = initial.pack_state()
+        if packed is None:
+            print("External memory search needs states that provide pack_state(); searching in memory.")
+            self.open.insert(sNode(initial, 0, self.fval_function))
+            return self._searchOpen(goal_fn, _zero_hfn, self.fval_function, costbound)
+
+        record_size = len(packed)
+        on_expand, on_generate, on_prune = self.on_expand, self.on_generate, self.on_prune
+        workdir = tempfile.mkdtemp(prefix='bfs', dir=self.external_directory)
+        layers = [os.path.join(workdir, 'layer0')]
+        self.external_layer_sizes = [_write_records(layers[0], [packed])]
+        try:
+            depth = 0
+            while self.external_layer_sizes[depth]:
+                #BEGIN TRACING
+                if self.trace:
+                    print("   TRACE: Expanding layer {} of {} states".format(depth, self.external_layer_sizes[depth]))
+                #END TRACING
+                runs = []
+                buffer = []
+                generated = 0
+                for packed in _read_records(layers[depth], record_size):
+                    state = initial.unpack_state(packed)
+                    node = sNode(state, 0, self.fval_function)
+                    if goal_fn(state):
+                        node.state = self._external_path(initial, layers, depth, packed, record_size)
+                        node.gval = node.state.gval
+                        return node
+                    if self._time_is_up():
+                        return False
+                    if on_expand: on_expand(node)
+                    successors = self._live_successors(state)
+                    if costbound is not None and depth + 1 > costbound[0]:
+                        self.cost_bound_pruned = self.cost_bound_pruned + len(successors)
+                        if on_prune:
+                            for succ in successors: on_prune(succ, 'cost_bound')
+                        continue
+                    for succ in successors:
+                        if on_generate: on_generate(succ)
+                        buffer.append(succ.pack_state())
+                    if len(buffer) >= self.external_buffer_states:
+                        runs.append(os.path.join(workdir, 'run{}'.format(len(runs))))
+                        generated = generated + len(buffer)
+                        _write_records(runs[-1], sorted(set(buffer)))
+                        buffer = []
+
+                #merge the runs into the next layer, leaving out the states
+                #of the layers it could duplicate
+                generated = generated + len(buffer)
+                buffer = sorted(set(buffer))
+                earlier = layers[-self.external_locality:] if self.external_locality else layers
+                successors = heapq.merge(buffer, *[_read_records(run, record_size) for run in runs])
+                old = heapq.merge(*[_read_records(layer, record_size) for layer in earlier])
+                layers.append(os.path.join(workdir, 'layer{}'.format(depth + 1)))
+                self.external_layer_sizes.append(_write_records(layers[-1], _new_records(successors, old)))
+                self.cycle_check_pruned = self.cycle_check_pruned + generated - self.external_layer_sizes[-1]
+                for run in runs:
+                    os.remove(run)
+                depth = depth + 1
+            self.external_layer_sizes.pop()
+            return False
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def _external_path(self, initial, layers, depth, packed, record_size):
+        """
+        Returns the goal packed in the layer file layers[depth] with its path
+        from initial. A parent of each state on the path is found by scanning
+        the layer before it, then the path is replayed forwards from initial.
+        """
+        path = [packed]
+        for layer in reversed(layers[:depth]):
+            for parent in _read_records(layer, record_size):
+                if any(succ.pack_state() == packed for succ in initial.unpack_state(parent).successors()):
+                    packed = parent
+                    path.append(packed)
+                    break
+        state = initial
+        for packed in reversed(path[:-1]):
+            state = next(succ for succ in state.successors() if succ.pack_state() == packed)
+        return state
+
+    def _searchHDA(self, goal_fn, heur_fn, costbound):
+        """
+        Hash distributed A* from the node on self.open (see set_parallel).
+        This process starts the workers and coordinates them: it passes on
+        the cost of each cheaper solution found, and detects termination
+        by probing the workers until two rounds of replies in a row find
+        them all idle, with the same numbers of states sent and received.
+        The path to the goal is then rebuilt by asking the workers for the
+        parent of each state on it, and replayed from the initial state.
+
+        @param goal_fn: the goal function.
+        @param heur_fn: the heuristic function.
+        @param costbound: the cost bound 3-tuple, as described in the assignment.
+        """
+        try:
+            context = multiprocessing.get_context('fork')
+        except ValueError:
+            print("Parallel search needs the fork start method; searching in this process.")
+            return self._searchOpen(goal_fn, heur_fn, self.fval_function, costbound)
+
+        if self.deadline.clock is not monotonic:
+            #this process mostly waits for the workers, so its CPU time says little
+            self.deadline = Deadline(self.deadline.remaining(), 'wall', self.deadline.check_every, self.deadline.cancel)
+
+        initial = self.open.extract().state
+        processes = self.processes
+        owner = lambda hash_state: _hda_owner(hash_state, processes)
+        inboxes = [context.Queue() for _ in range(processes)]
+        results = context.Queue()
+        workers = [context.Process(target = _hda_worker, daemon = True,
+                                   args = (wid, inboxes, results, initial, goal_fn, heur_fn, costbound, self.parallel_batch_size))
+                   for wid in range(processes)]
+        for worker in workers:
+            worker.start()
+
+        data = initial.pack_state()
+        if data is None:
+            data = copy.copy(initial)
+            data.parent = None
+        inboxes[owner(initial.hashable_state())].put(('states', [(data, initial.gval, None)]))
+        incumbent = float('inf')
+        goal_hash = None
+        probe = 0
+        replies = None
+        last_counts = None
+
+        def workers_alive():
+            if all(worker.is_alive() for worker in workers):
+                return True
+            print("TRACE: An HDA* worker has died; the search has failed.")
+            return False
+
+        def receive(match):
+            '''Return the next result for which match is True, or None if a worker has died'''
+            while True:
+                try:
+                    message = results.get(timeout = 0.05)
+                except queue.Empty:
+                    if not workers_alive():
+                        return None
+                    continue
+                if match(message):
+                    return message
+
+        try:
+            #each pass may wait on the results queue, so the clock is read every time
+            while not self._time_is_up(now = True):
+                if replies is None:
+                    #start the next round of probes
+                    probe = probe + 1
+                    replies = dict()
+                    for inbox in inboxes:
+                        inbox.put(('probe', probe))
+                try:
+                    message = results.get(timeout = 0.05)
+                except queue.Empty:
+                    if not workers_alive():
+                        #the states it held are lost, so no solution can be trusted
+                        goal_hash = None
+                        break
+                    continue
+                if message[0] == 'goal' and message[1] < incumbent:
+                    incumbent, goal_hash = message[1], message[2]
+                    #BEGIN TRACING
+                    if self.trace:
+                        print("   TRACE: HDA* found a solution of cost {}".format(incumbent))
+                    #END TRACING
+                    for inbox in inboxes:
+                        inbox.put(('incumbent', incumbent))
+                elif message[0] == 'status' and message[2] == probe:
+                    replies[message[1]] = message[3:]
+                    if len(replies) == processes:
+                        #the initial state was sent by this process
+                        counts = (1 + sum(r[1] for r in replies.values()), sum(r[2] for r in replies.values()))
+                        if all(r[0] for r in replies.values()) and counts[0] == counts[1]:
+                            if counts == last_counts:
+                                break
+                            last_counts = counts
+                        else:
+                            last_counts = None
+                        replies = None
+
+            path = []
+            if goal_hash is not None:
+                hash_state = goal_hash
+                while hash_state is not None:
+                    path.append(hash_state)
+                    inboxes[owner(hash_state)].put(('parent', hash_state))
+                    message = receive(lambda message: message[0] == 'parent' and message[1] == hash_state)
+                    if message is None:
+                        goal_hash = None
+                        break
+                    hash_state = message[2]
+
+            for inbox in inboxes:
+                inbox.put(('stop',))
+            stopped = 0
+            #a worker that has died cannot report
+            running = sum(1 for worker in workers if worker.is_alive())
+            while stopped < running:
+                try:
+                    message = results.get(timeout = 10)
+                except queue.Empty:
+                    #a worker is slow to stop or has died; its statistics are lost
+                    #and it is terminated below
+                    print("TRACE: {} HDA* workers did not report their statistics.".format(running - stopped))
+                    break
+                if message[0] == 'stats':
+                    stopped = stopped + 1
+                    counts = message[2]
+                    #sNode.n counts the nodes made, as in the other searches
+                    sNode.n = sNode.n + counts['nodes']
+                    StateSpace.n = StateSpace.n + counts['generated']
+                    self.cycle_check_pruned = self.cycle_check_pruned + counts['cycle_check_pruned']
+                    self.cost_bound_pruned = self.cost_bound_pruned + counts['cost_bound_pruned']
+        finally:
+            for worker in workers:
+                worker.join(1)
+                if worker.is_alive():
+                    worker.terminate()
+
+        if goal_hash is None:
+            return False
+        #replay the path, taking the cheapest action between consecutive states
+        state = initial
+        for hash_state in reversed(path[:-1]):
+            state = min((succ for succ in state.successors() if succ.hashable_state() == hash_state), key = lambda succ: succ.gval)
+        return sNode(state, heur_fn(state), self.fval_function)
+
+    def _searchIDA(self, goal_fn, heur_fn, costbound):
+        """
+        Iterative deepening A* search, starting from the node on self.open.
+        Each iteration is a depth-first search that prunes successors whose
+        f-value (gval + hval) exceeds the current f-bound. The next bound is
+        the smallest f-value that was pruned. Only the current path and its
+        successors are stored, so memory grows linearly with solution depth.
+
+        @param goal_fn: the goal function.
+        @param heur_fn: the heuristic function.
+        @param costbound: the cost bound 3-tuple, as described in the assignment.
+        """
+        root = self.open.extract()
+        fbound = root.gval + root.hval
+        on_expand, on_generate, on_prune = self.on_expand, self.on_generate, self.on_prune
+
+        while True:
+            #BEGIN TRACING
+            if self.trace:
+                print("   TRACE: IDA* iteration with f-bound = {}".format(fbound))
+            #END TRACING
+
+            next_fbound = None
+            #for path checking keep the states on the current path in a set
+            path = set()
+            if self.cycle_check == _CC_PATH:
+                path.add(root.state.hashable_state())
+            #each stack entry is a node on the current path along with an
+            #iterator over the successors not yet explored (None if the
+            #node has not been expanded yet)
+            stack = [[root, None]]
+
+            while stack:
+                top = stack[-1]
+                node = top[0]
+
+                if top[1] is None:
+                    #BEGIN TRACING
+                    if self.trace:
+                        print("   TRACE: Next State to expand: <S{}:{}:{}, g={}, h={}, f=g+h={}>".format(
+                            node.state.index, node.state.action, node.state.hashable_state(), node.gval, node.hval, node.gval + node.hval))
+                    #END TRACING
+
+                    if goal_fn(node.state):
+                        return node
+
+                    if self._time_is_up(): #timebound check
+                        return False
+
+                    if on_expand: on_expand(node)
+                    top[1] = iter(self._live_successors(node.state))
+
+                succ = next(top[1], None)
+                if succ is None:
+                    #all successors explored, backtrack
+                    stack.pop()
+                    if self.cycle_check == _CC_PATH:
+                        path.discard(node.state.hashable_state())
+                    continue
+
+                if on_generate: on_generate(succ)
+                if self.cycle_check == _CC_PATH:
+                    hash_state = succ.hashable_state()
+                    if hash_state in path:
+                        self.cycle_check_pruned = self.cycle_check_pruned + 1
+                        if on_prune: on_prune(succ, 'cycle_check')
+                        continue
+
+                succ_hval = heur_fn(succ)
+                if costbound is not None and (succ.gval > costbound[0] or
+                                              succ_hval > costbound[1] or
+                                              succ.gval + succ_hval > costbound[2]) :
+                    self.cost_bound_pruned = self.cost_bound_pruned + 1
+                    if on_prune: on_prune(succ, 'cost_bound')
+                    continue
+
+                succ_fval = succ.gval + succ_hval
+                if succ_fval > fbound:
+                    #outside of this iteration's bound, remember for the next one
+                    if next_fbound is None or succ_fval < next_fbound:
+                        next_fbound = succ_fval
+                    continue
+
+                if self.cycle_check == _CC_PATH:
+                    path.add(hash_state)
+                stack.append([sNode(succ, succ_hval, node.fval_function), None])
+
+            if next_fbound is None:
+                #no successor was pruned by the f-bound, so the search space is exhausted
+                return False
+            fbound = next_fbound
+
+    def _join_paths(self, forward_state, backward_state):
+        """
+        Join a path found by the forward search with one found by the backward
+        search that meet in the same state. Returns a copy of the goal state
+        whose parent chain runs from the initial state to the goal.
+
+        @param forward_state: a state reached from the initial state.
+        @param backward_state: the same state reached backwards from the goal state.
+        """
+        state = forward_state
+        while backward_state.parent:
+            next_state = copy.copy(backward_state.parent)
+            next_state.action = backward_state.action
+            next_state.gval = state.gval + (backward_state.gval - backward_state.parent.gval)
+            next_state.parent = state
+            next_state.index = StateSpace.n
+            StateSpace.n = StateSpace.n + 1
+            state = next_state
+            backward_state = backward_state.parent
+        return state
+
+    def _searchBidirectionalBFS(self, costbound):
+        """
+        Bidirectional breadth first search between the node on self.open and
+        self.goal_state. A whole layer of the smaller side is expanded at a
+        time; the cheapest meeting found while expanding a layer is returned.
+
+        @param costbound: the cost bound 3-tuple, as described in the assignment.
+        """
+        init_node = self.open.extract()
+        init_state = init_node.state
+        goal_state = self.goal_state
+        forward = {init_state.hashable_state(): init_state}
+        backward = {goal_state.hashable_state(): goal_state}
+        if init_state.hashable_state() in backward:
+            return init_node
+        forward_layer = [init_state]
+        backward_layer = [goal_state]
+
+        while forward_layer and backward_layer:
+            is_forward = len(forward_layer) <= len(backward_layer)
+            if is_forward:
+                layer, seen, other, base_gval = forward_layer, forward, backward, init_state.gval
+            else:
+                layer, seen, other, base_gval = backward_layer, backward, forward, goal_state.gval
+
+            #BEGIN TRACING
+            if self.trace:
+                print("   TRACE: Expanding {} layer of {} states".format("forward" if is_forward else "backward", len(layer)))
+            #END TRACING
+
+            next_layer = []
+            best_cost = None
+            for state in layer:
+                if self._time_is_up(): #timebound check
+                    return False
+
+                sNode.n = sNode.n + 1
+                successors = state.successors() if is_forward else state.predecessors()
+                for succ in successors:
+                    hash_state = succ.hashable_state()
+                    if hash_state in seen:
+                        self.cycle_check_pruned = self.cycle_check_pruned + 1
+                        continue
+                    gval = succ.gval - base_gval
+                    if costbound is not None and (gval > costbound[0] or gval > costbound[2]):
+                        self.cost_bound_pruned = self.cost_bound_pruned + 1
+                        continue
+                    seen[hash_state] = succ
+                    next_layer.append(succ)
+                    if hash_state in other:
+                        meet = other[hash_state]
+                        cost = gval + meet.gval - (goal_state.gval if is_forward else init_state.gval)
+                        if best_cost is None or cost < best_cost:
+                            best_cost = cost
+                            best_meet = (succ, meet) if is_forward else (meet, succ)
+
+            if best_cost is not None:
+                return sNode(self._join_paths(best_meet[0], best_meet[1]), 0, init_node.fval_function)
+
+            if is_forward:
+                forward_layer = next_layer
+            else:
+                backward_layer = next_layer
+
+        return False
+
+    def _searchBidirectionalAstar(self, heur_fn, backward_heur_fn, costbound):
+        """
+        Front-to-end bidirectional A* between the node on self.open and
+        self.goal_state. The forward search is guided by heur_fn (an estimate
+        of the cost to the goal) and the backward search by backward_heur_fn
+        (an estimate of the cost back to the initial state). The side with
+        the smaller OPEN is expanded next. With admissible heuristics the
+        search stops with an optimal path once the smallest f-value on
+        either OPEN is no less than the cheapest path found through a
+        state reached from both sides.
+
+        @param heur_fn: the forward heuristic function.
+        @param backward_heur_fn: the backward heuristic function.
+        @param costbound: the cost bound 3-tuple, as described in the assignment.
+        """
+        init_node = self.open.extract()
+        init_state = init_node.state
+        goal_state = self.goal_state
+        counter = count()
+        goal_hval = backward_heur_fn(goal_state)
+        forward_open = [(init_node.gval + init_node.hval, -init_node.gval, next(counter), init_node.hval, init_state)]
+        backward_open = [(goal_hval, 0, next(counter), goal_hval, goal_state)]
+        forward = {init_state.hashable_state(): init_state}
+        backward = {goal_state.hashable_state(): goal_state}
+        if init_state.hashable_state() in backward:
+            return init_node
+
+        best_cost = None
+        best_meet = None
+        while forward_open and backward_open:
+            if best_cost is not None and max(forward_open[0][0], backward_open[0][0]) >= best_cost:
+                break
+
+            is_forward = len(forward_open) <= len(backward_open)
+            if is_forward:
+                open_list, seen, other, fn, base_gval = forward_open, forward, backward, heur_fn, init_state.gval
+            else:
+                open_list, seen, other, fn, base_gval = backward_open, backward, forward, backward_heur_fn, goal_state.gval
+
+            fval, _, _, hval, state = heapq.heappop(open_list)
+            hash_state = state.hashable_state()
+            if seen[hash_state] is not state:
+                #stale entry, the state has since been reached via a cheaper path
+                continue
+
+            #BEGIN TRACING
+            if self.trace:
+                print("   TRACE: Next {} State to expand: <S{}:{}:{}, g={}, h={}, f=g+h={}>".format(
+                    "forward" if is_forward else "backward", state.index, state.action, hash_state, state.gval - base_gval, hval, fval))
+            #END TRACING
+
+            if self._time_is_up(): #timebound check
+                return False
+
+            sNode.n = sNode.n + 1
+            successors = state.successors() if is_forward else state.predecessors()
+            for succ in successors:
+                hash_state = succ.hashable_state()
+                if hash_state in seen and seen[hash_state].gval <= succ.gval:
+                    self.cycle_check_pruned = self.cycle_check_pruned + 1
+                    continue
+                gval = succ.gval - base_gval
+                succ_hval = fn(succ)
+                if costbound is not None and (gval > costbound[0] or
+                                              (is_forward and succ_hval > costbound[1]) or
+                                              gval + succ_hval > costbound[2]) :
+                    self.cost_bound_pruned = self.cost_bound_pruned + 1
+                    continue
+                seen[hash_state] = succ
+                heapq.heappush(open_list, (gval + succ_hval, -gval, next(counter), succ_hval, succ))
+                if hash_state in other:
+                    meet = other[hash_state]
+                    cost = gval + meet.gval - (goal_state.gval if is_forward else init_state.gval)
+                    if best_cost is None or cost < best_cost:
+                        best_cost = cost
+                        best_meet = (succ, meet) if is_forward else (meet, succ)
+
+        if best_meet is None:
+            return False
+        return sNode(self._join_paths(best_meet[0], best_meet[1]), 0, init_node.fval_function)
+
+    def init_ara_search(self, initState, goal_fn, heur_fn=_zero_hfn, weight=1.0):
+        """
+        Get ready for an anytime repairing A* (ARA*) search. Nodes are ordered
+        by gval + weight*hval. Unlike repeatedly calling init_search and search
+        with decreasing weights, ARA* keeps OPEN, CLOSED and the states whose
+        gval improved after they were expanded (INCONS) between iterations, so
+        each new iteration only re-expands states that have a cheaper path.
+        Call ara_search to find a solution for the current weight, then
+        ara_decrease_weight and ara_search again to improve it.
+
+        @param initState: the state of the puzzle to start the search from.
+        @param goal_fn: the goal function for the puzzle
+        @param heur_fn: the heuristic function to use
+        @param weight: the initial weight on the heuristic
+        """
+        self.initStats()
+
+        #BEGIN TRACING
+        if self.trace:
+            print("   TRACE: Search Strategy: ARA* with weight", weight)
+            print("   TRACE: Initial State:", end="")
+            initState.print_state()
+        #END TRACING
+
+        self.goal_fn = goal_fn
+        self.heur_fn = heur_fn
+        self.ara_weight = weight
+        self.ara_counter = count()
+        #OPEN maps a state to [state, hval, counter]; the heap holds
+        #(key, -gval, counter, hashable state) entries, and an entry is
+        #stale if its counter no longer matches the one in OPEN.
+        self.ara_open = dict()
+        self.ara_heap = []
+        self.ara_closed = set()
+        self.ara_incons = dict()
+        #the cheapest goal state found so far
+        self.ara_goal = None
+        #the cheapest path (g-val) found so far to each state
+        self.cc_dictionary = dict()
+        self.cc_dictionary[initState.hashable_state()] = initState.gval
+        if goal_fn(initState):
+            self.ara_goal = initState
+        self._ara_insert(initState.hashable_state(), initState, heur_fn(initState))
+
+    def _ara_insert(self, hash_state, state, hval):
+        counter = next(self.ara_counter)
+        self.ara_open[hash_state] = [state, hval, counter]
+        heapq.heappush(self.ara_heap, (state.gval + self.ara_weight*hval, -state.gval, counter, hash_state))
+
+    def ara_decrease_weight(self, weight):
+        """
+        Set a new (smaller) weight for the next ARA* iteration. The states
+        in INCONS are moved to OPEN, OPEN is re-keyed with the new weight
+        and CLOSED is emptied.
+
+        @param weight: the new weight on the heuristic
+        """
+        self.ara_weight = weight
+        for hash_state, entry in self.ara_incons.items():
+            self.ara_open[hash_state] = entry
+        self.ara_incons = dict()
+        self.ara_closed = set()
+        self.ara_heap = []
+        for hash_state, entry in self.ara_open.items():
+            state, hval = entry[0], entry[1]
+            entry[2] = next(self.ara_counter)
+            self.ara_heap.append((state.gval + weight*hval, -state.gval, entry[2], hash_state))
+        heapq.heapify(self.ara_heap)
+
+    def ara_search(self, timebound=None):
+        """
+        Run the current ARA* iteration until the cheapest goal found costs no
+        more than the smallest key on OPEN, i.e., until it is within a factor
+        of the current weight of optimal (for an admissible heuristic).
+        Returns the cheapest goal state found so far (possibly by an earlier
+        iteration, or when the time bound is reached), else False.
+
+        @param timebound: the maximum amount of time, in seconds, to spend on this iteration (see set_timing), or a Deadline.
+        """
+        self.search_start_time = os.times()[0]
+        self.deadline = self._make_deadline(timebound)
+
+        goal_fn = self.goal_fn
+        heur_fn = self.heur_fn
+        heap = self.ara_heap
+        while heap:
+            if self.ara_goal and self.ara_goal.gval <= heap[0][0]:
+                break
+
+            if self._time_is_up(): #timebound check
+                break
+
+            key, _, counter, hash_state = heapq.heappop(heap)
+            entry = self.ara_open.get(hash_state)
+            if entry is None or entry[2] != counter:
+                #stale entry, the state has since been reached via a cheaper path
+                continue
+            del self.ara_open[hash_state]
+            self.ara_closed.add(hash_state)
+            state = entry[0]
+
+            #BEGIN TRACING
+            if self.trace:
+                print("   TRACE: Next State to expand: <S{}:{}:{}, g={}, h={}, key={}>".format(
+                    state.index, state.action, hash_state, state.gval, entry[1], key))
+            #END TRACING
+
+            if goal_fn(state):
+                #no point expanding a goal, it is already the incumbent (or worse)
+                continue
+
+            sNode.n = sNode.n + 1
+            for succ in state.successors():
+                succ_hash = succ.hashable_state()
+                if succ_hash in self.cc_dictionary and self.cc_dictionary[succ_hash] <= succ.gval:
+                    self.cycle_check_pruned = self.cycle_check_pruned + 1
+                    continue
+                if self.ara_goal and succ.gval >= self.ara_goal.gval:
+                    #cannot lead to a cheaper solution than the one we have
+                    self.cost_bound_pruned = self.cost_bound_pruned + 1
+                    continue
+                self.cc_dictionary[succ_hash] = succ.gval
+                succ_hval = heur_fn(succ)
+                if goal_fn(succ):
+                    self.ara_goal = succ
+                if succ_hash in self.ara_closed:
+                    #already expanded in this iteration, wait for the next one
+                    self.ara_incons[succ_hash] = [succ, succ_hval, None]
+                else:
+                    self._ara_insert(succ_hash, succ, succ_hval)
+
+        if self.ara_goal:
+            return self.ara_goal
+        return False
@@ -8,6 +8,8 @@
 
 #import os for time functions
 import math
+import time
+import multiprocessing
 
 from search import * #for search engines
 from lunarlockout import LunarLockoutState, Direction, lockout_goal_state #for LunarLockout specific classes and problems
@@ -97,6 +99,8 @@ def heur_alternate(state):
     #Since there are a len(state.xanadus) amount of xanadaus, our base value for the heuristic is the number of xanadus
     #since we need to get all of them to the goal to win
     heur_alt = len(state.xanadus)
+    #the locations are decoded from the packed state on each access, so only do it once
+    robots = state.robots
 
     for xanadu in state.xanadus:
         #Keeps track of any robots between any xanadus and the goal.  Add 1 to the heuristic since
@@ -111,7 +115,7 @@ def heur_alternate(state):
         if xanadu[0] == middle_x and xanadu[1] == middle_y:
             heur_alt -= 1
         else:
-            for robot in state.robots:
+            for robot in robots:
                 # Check if the xanadu is in the middle column / row, if not add 1 since we need at least 1 move
                 # to get into the centre areas
                 if xanadu[0] != middle_x or xanadu[1] != middle_y:
@@ -174,16 +178,18 @@ def anytime_weighted_astar(initial_state, heur_fn, weight=4., timebound = 2):
     '''OUTPUT: A goal state (if a goal is found), else False'''
     '''implementation of weighted astar algorithm'''
     our_search_engine = SearchEngine('custom', 'full')
-    #Pulled from the search code
-    end_time = os.times()[0] + timebound
+    #The searches share one time budget
+    deadline = Deadline(timebound)
     end_state = None
-    while os.times()[0] < end_time and weight >= 1:
+    while not deadline.expired_now() and weight >= 1:
         #Defined on assignment sheet
         wrapped_fval_function = (lambda  sN: fval_function(sN, weight))
         #Initialize our search engine
         our_search_engine.init_search(initial_state, lockout_goal_state, heur_fn, wrapped_fval_function)
-        #Get the final time
-        end_state = our_search_engine.search(timebound)
+        #Search for the rest of the time, keeping the last solution found
+        state = our_search_engine.search(deadline)
+        if state:
+            end_state = state
         #Decrease weight
         weight -= 1
     #Returns the goal state if goal state is found else we return false
@@ -192,6 +198,102 @@ def anytime_weighted_astar(initial_state, heur_fn, weight=4., timebound = 2):
     else:
         return False
 
+class SharedCostBound:
+  '''A cost bound 3-tuple (see SearchEngine.search) whose gval bound is just below the best solution cost found so
+  far by any of the processes sharing the underlying multiprocessing.Value, so that paths that already cost as much
+  as the best solution (which cannot lead to a cheaper one) are pruned. unit is the smallest difference between
+  solution costs (1 for LunarLockout, where every move costs 1). The value is read without locking.'''
+
+  def __init__(self, best_cost, unit = 1):
+    self.best_cost = best_cost.get_obj()
+    self.unit = unit
+
+  def __getitem__(self, i):
+    if i == 0:
+      return self.best_cost.value - self.unit
+    return float('inf')
+
+#the best solution cost shared by the processes of a portfolio, set up by _init_portfolio_worker
+_portfolio_best_cost = None
+
+def _init_portfolio_worker(best_cost):
+  global _portfolio_best_cost
+  _portfolio_best_cost = best_cost
+
+def _portfolio_worker(initial_state, heur_fn, weight, deadline):
+  '''Runs one weighted A star search of a portfolio until the (wall clock) deadline, pruning paths that cost
+  more than the best solution found by any process so far. Returns the goal state found, else False.'''
+  timebound = deadline - time.time()
+  if timebound <= 0:
+    return False
+  our_search_engine = SearchEngine('custom', 'full')
+  wrapped_fval_function = (lambda sN: fval_function(sN, weight))
+  our_search_engine.init_search(initial_state, lockout_goal_state, heur_fn, wrapped_fval_function)
+  end_state = our_search_engine.search(Deadline(timebound, 'wall'), SharedCostBound(_portfolio_best_cost))
+  if end_state:
+    with _portfolio_best_cost.get_lock():
+      if end_state.gval < _portfolio_best_cost.value:
+        _portfolio_best_cost.value = end_state.gval
+  return end_state
+
+def anytime_weighted_astar_portfolio(initial_state, heur_fns = None, weights = (4., 3., 2., 1.), timebound = 2, processes = None):
+  '''Provides a parallel version of anytime weighted a-star. Rather than running the weights one after the other,
+  every (heuristic, weight) pair is run as a separate weighted a-star search in a pool of processes. The cost of the
+  best solution found so far is shared between the processes, which use it to prune more expensive paths.'''
+  '''INPUT: a lunar lockout state that represents the start state, the heuristics and weights to combine,
+  a timebound (number of seconds of wall clock time) and the number of processes (defaults to the number of CPUs)'''
+  '''OUTPUT: The cheapest goal state found (if a goal is found), else False'''
+  if heur_fns is None:
+    heur_fns = (heur_alternate, heur_L_distance, heur_manhattan_distance)
+  deadline = time.time() + timebound
+  best_cost = multiprocessing.Value('d', float('inf'))
+  pool = multiprocessing.Pool(processes, _init_portfolio_worker, (best_cost,))
+  try:
+    #larger weights first, as they are the quickest to find a (first) solution
+    results = [pool.apply_async(_portfolio_worker, (initial_state, heur_fn, weight, deadline))
+               for weight in weights for heur_fn in heur_fns]
+    end_state = False
+    for result in results:
+      try:
+        #allow a little time past the deadline for the workers to notice it and return
+        state = result.get(max(0, deadline - time.time()) + 0.5)
+      except multiprocessing.TimeoutError:
+        continue
+      if state and (not end_state or state.gval < end_state.gval):
+        end_state = state
+  finally:
+    pool.terminate()
+  return end_state
+
+def anytime_repairing_astar(initial_state, heur_fn, weight=4., timebound = 2):
+    '''Provides an implementation of anytime repairing a-star (ARA*)'''
+    '''INPUT: a lunar lockout state that represents the start state and a timebound (number of seconds)'''
+    '''OUTPUT: A goal state (if a goal is found), else False'''
+    '''Like anytime_weighted_astar, each iteration orders states by the f-value of fval_function and the weight is
+    decreased by one after each iteration. Rather than starting a new search for every weight, the search engine
+    keeps its OPEN and CLOSED sets between iterations, so later iterations only re-expand the states to which a
+    cheaper path was found. Each iteration stops once no state on OPEN can lead to a cheaper solution, so with an
+    admissible heuristic the solutions are within a factor of the weight of optimal; with an inadmissible heuristic
+    (such as heur_alternate) a search restarted from scratch may still find cheaper solutions.'''
+    our_search_engine = SearchEngine('custom', 'full')
+    deadline = Deadline(timebound)
+    end_state = None
+    our_search_engine.init_ara_search(initial_state, lockout_goal_state, heur_fn, weight)
+    while not deadline.expired_now() and weight >= 1:
+        #Search with the current weight for the rest of the time
+        state = our_search_engine.ara_search(deadline)
+        if state:
+            end_state = state
+        #Decrease weight
+        weight -= 1
+        if weight >= 1:
+            our_search_engine.ara_decrease_weight(weight)
+    #Returns the goal state if goal state is found else we return false
+    if end_state:
+        return end_state
+    else:
+        return False
+
 def anytime_gbfs(initial_state, heur_fn, timebound = 2):
 #OPTIONAL
   '''Provides an implementation of anytime greedy best-first search.  This iteratively uses greedy best first search,'''
@@ -0,0 +1,186 @@
+'''A persistent cache of LunarLockout solutions.
+
+    Boards that are rotations or reflections of each other, or that only differ in which robot (or xanadu) is
+    where, have solutions of the same cost (see LunarLockoutState.canonical_state). A SolutionCache stores one
+    solution for each such class of boards in an SQLite database, so that it survives restarts and can be
+    shared by worker processes, e.g.
+
+      cache = SolutionCache('solutions.db')
+      final = cache.lookup(state)
+      if final is None:
+        final = anytime_weighted_astar(state, heur_alternate, 4., 2.)
+        if final:
+          cache.store(state, final)
+
+    A) The stored solutions
+
+    A solution is stored in the frame of the canonical board of its class, as the list of moves (the cell a
+    piece moved from and the cell it stopped in). A lookup maps the moves back to the frame of the board it is
+    given and replays them, so the states, action names and gvals returned are those of a search from that
+    board.
+
+    B) Eviction
+
+    Each entry records when it was last stored or looked up (to within a minute, so that most lookups do not
+    write to the database); when there are more than max_entries the least recently used are removed.
+'''
+
+import json
+import sqlite3
+import time
+
+from lunarlockout import lockout_goal_state, UP, RIGHT, DOWN, LEFT
+
+#seconds before a lookup records a new last use of an entry
+_TOUCH_INTERVAL = 60
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS solutions (
+  key TEXT PRIMARY KEY,
+  cost REAL NOT NULL,
+  optimal INTEGER NOT NULL,
+  moves TEXT NOT NULL,
+  last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS solutions_last_used ON solutions (last_used);
+'''
+
+def _cells(state):
+  '''Returns the cells (y*size + x) of the pieces of state, robots first and then xanadus.'''
+  layout = state.layout
+  code = state.code
+  mask = layout.mask
+  return [((code >> ys) & mask) * layout.size + ((code >> xs) & mask) for xs, ys in layout.shifts]
+
+def _frame_key(state, symmetry):
+  '''Returns the key of state under symmetry, as in LunarLockoutState.canonical_state.'''
+  layout = state.layout
+  cells = layout.size * layout.size
+  pieces = _cells(state)
+  key = 0
+  for cell in sorted([symmetry[c] for c in pieces[layout.num_robots:]]) + sorted([symmetry[c] for c in pieces[:layout.num_robots]]):
+    key = key * cells + cell
+  return key
+
+def _canonical_frame(state):
+  '''Returns the cache key of state and a symmetry of the board that takes state to its canonical board.'''
+  layout = state.layout
+  canonical = state.canonical_state()
+  for symmetry in layout.symmetries:
+    if _frame_key(state, symmetry) == canonical:
+      break
+  key = '{}/{}/{}/{}'.format(layout.size, layout.num_robots, layout.num_xanadus, canonical)
+  return key, symmetry
+
+class SolutionCache():
+    '''
+    Solutions of LunarLockout boards, in the SQLite database at path (created if need be). Several processes
+    may use the same file, each with its own SolutionCache.
+    '''
+
+    def __init__(self, path, max_entries = 100000):
+        '''
+        @param path: The database file.
+        @param max_entries: The number of solutions kept; the least recently used are evicted beyond it.
+        '''
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        #write ahead logging lets readers proceed while another process writes
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM solutions').fetchone()[0]
+
+    def lookup(self, state):
+        '''
+        Returns the final state of the cached solution of state, with its path from state (as search returns
+        it), or None if there is none. Use lookup_entry to also learn whether it is known to be optimal.
+        '''
+        entry = self.lookup_entry(state)
+        return entry[0] if entry else None
+
+    def lookup_entry(self, state):
+        '''Returns a (final state, optimal) pair for the cached solution of state, or None if there is none.'''
+        key, symmetry = _canonical_frame(state)
+        row = self.connection.execute('SELECT moves, optimal, last_used FROM solutions WHERE key = ?', (key,)).fetchone()
+        if row is None:
+          self.misses += 1
+          return None
+        final = self._replay(state, symmetry, json.loads(row[0]))
+        if final is None:
+          #the moves do not apply (the entry was written for another board); drop it
+          self.connection.execute('DELETE FROM solutions WHERE key = ?', (key,))
+          self.misses += 1
+          return None
+        now = time.time()
+        if now - row[2] > _TOUCH_INTERVAL:
+          self.connection.execute('UPDATE solutions SET last_used = ? WHERE key = ?', (now, key))
+        self.hits += 1
+        return final, bool(row[1])
+
+    def store(self, state, final, optimal = False):
+        '''
+        Stores the solution of state ending in final (a goal state whose parents lead back to state). An entry
+        that is already cached is only replaced by a cheaper solution, or by one of the same cost that is known
+        to be optimal. Returns True if the solution was stored.
+        @param optimal: True if the solution is known to be optimal (e.g., found by A* with an admissible heuristic).
+        '''
+        key, symmetry = _canonical_frame(state)
+        path = []
+        s = final
+        while s is not None:
+          path.append(_cells(s))
+          s = s.parent
+        path.reverse()
+        moves = []
+        for before, after in zip(path, path[1:]):
+          for cell, new_cell in zip(before, after):
+            if cell != new_cell:
+              moves.append((symmetry[cell], symmetry[new_cell]))
+              break
+
+        with self.connection:
+          self.connection.execute('BEGIN IMMEDIATE')
+          row = self.connection.execute('SELECT cost, optimal FROM solutions WHERE key = ?', (key,)).fetchone()
+          if row is not None and (row[0] < final.gval or (row[0] == final.gval and (row[1] or not optimal))):
+            return False
+          self.connection.execute('INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?)',
+                                  (key, final.gval, int(optimal), json.dumps(moves), time.time()))
+          excess = self.connection.execute('SELECT COUNT(*) FROM solutions').fetchone()[0] - self.max_entries
+          if excess > 0:
+            self.connection.execute('DELETE FROM solutions WHERE key IN (SELECT key FROM solutions ORDER BY last_used LIMIT ?)', (excess,))
+        return True
+
+    @staticmethod
+    def _replay(state, symmetry, moves):
+        '''Returns the state reached from state by the moves (in the frame given by symmetry), or None.'''
+        inverse = [0] * len(symmetry)
+        for cell, image in enumerate(symmetry):
+          inverse[image] = cell
+        layout = state.layout
+        size = layout.size
+        for cell, new_cell in moves:
+          cell, new_cell = inverse[cell], inverse[new_cell]
+          pieces = _cells(state)
+          if not cell in pieces:
+            return None
+          #the move is made directly rather than by generating all the successors
+          piece = pieces.index(cell)
+          if piece < layout.num_robots:
+            name = chr(ord('a') + piece)
+          else:
+            name = chr(ord('A') + piece - layout.num_robots)
+          if new_cell % size == cell % size:
+            direction = DOWN if new_cell > cell else UP
+          else:
+            direction = RIGHT if new_cell > cell else LEFT
+          state = state.moved(name + " " + direction.name, state.gval + 1, piece, (new_cell % size, new_cell // size))
+        return state if lockout_goal_state(state) else None
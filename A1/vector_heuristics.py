@@ -0,0 +1,86 @@
+'''Batch versions of the LunarLockout heuristics.
+
+    A batch heuristic takes a list of states and returns the list of their heuristic values, so that the search
+    engine can evaluate all the successors of an expansion in one call (see the heur_fn_batch parameter of
+    SearchEngine.init_search), e.g.
+
+      se.init_search(state, lockout_goal_state, heur_L_distance, heur_fn_batch=heur_L_distance_batch)
+
+    The values are the same as those of heur_manhattan_distance and heur_L_distance in solution.py. They are
+    computed from the packed encodings of the states (see lunarlockout.BoardLayout) rather than from decoded
+    locations. If NumPy is available, batches of at least NUMPY_BATCH states whose encodings fit in 63 bits are
+    evaluated as arrays; otherwise (and for smaller batches, where the cost of making the arrays dominates) each
+    state is evaluated in Python.
+'''
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+#smallest batch evaluated with NumPy
+NUMPY_BATCH = 64
+
+def _xanadu_fields(states):
+  '''Returns the shared layout of states and the (x shift, y shift, mask, center) needed to decode their
+  xanadus, or None if the states do not all share a layout.'''
+  layout = states[0].layout
+  for state in states:
+    if state.layout is not layout:
+      return None
+  return layout, layout.xanadu_shifts, layout.mask, (layout.size - 1) // 2
+
+def _use_numpy(states, layout):
+  return numpy is not None and len(states) >= NUMPY_BATCH and 2 * layout.bits * len(layout.shifts) <= 63
+
+def heur_manhattan_distance_batch(states):
+  '''Manhattan distance LunarLockout heuristic of each of states (see heur_manhattan_distance).'''
+  if not states:
+    return []
+  fields = _xanadu_fields(states)
+  if fields is None:
+    return [heur_manhattan_distance_batch([state])[0] for state in states]
+  layout, shifts, mask, center = fields
+
+  if _use_numpy(states, layout):
+    codes = numpy.fromiter((state.code for state in states), dtype=numpy.int64, count=len(states))
+    total = numpy.zeros(len(states), dtype=numpy.int64)
+    for xs, ys in shifts:
+      total += numpy.abs(((codes >> xs) & mask) - center) + numpy.abs(((codes >> ys) & mask) - center)
+    return total.tolist()
+
+  values = []
+  for state in states:
+    code = state.code
+    total = 0
+    for xs, ys in shifts:
+      total += abs(((code >> xs) & mask) - center) + abs(((code >> ys) & mask) - center)
+    values.append(total)
+  return values
+
+def heur_L_distance_batch(states):
+  '''L distance LunarLockout heuristic of each of states (see heur_L_distance).'''
+  if not states:
+    return []
+  fields = _xanadu_fields(states)
+  if fields is None:
+    return [heur_L_distance_batch([state])[0] for state in states]
+  layout, shifts, mask, center = fields
+
+  if _use_numpy(states, layout):
+    codes = numpy.fromiter((state.code for state in states), dtype=numpy.int64, count=len(states))
+    total = numpy.zeros(len(states), dtype=numpy.int64)
+    for xs, ys in shifts:
+      #added one at a time, as the sum of two boolean arrays is their logical or
+      total += ((codes >> xs) & mask) != center
+      total += ((codes >> ys) & mask) != center
+    return total.tolist()
+
+  values = []
+  for state in states:
+    code = state.code
+    total = 0
+    for xs, ys in shifts:
+      total += (((code >> xs) & mask) != center) + (((code >> ys) & mask) != center)
+    values.append(total)
+  return values